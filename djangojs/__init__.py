@@ -9,3 +9,13 @@ __description__ = "Django JS Tools"
 #: Packaged jQuery version
 JQUERY_DEFAULT_VERSION = '2.0.3'
 JQUERY_MIGRATE_VERSION = '1.2.1'
+
+
+def fast_reverse(name, *args, **kwargs):
+    '''
+    Reverse an URL by name using the cached URLs templates,
+    see :func:`djangojs.urls_serializer.fast_reverse`.
+    '''
+    # Imported on call as this module is imported by setup.py
+    from djangojs.urls_serializer import fast_reverse
+    return fast_reverse(name, *args, **kwargs)
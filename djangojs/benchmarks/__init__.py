@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmarks for the URLs serializer.
+
+Synthetic URLconfs are generated in memory with :func:`generate_urlconf`
+and timed with :func:`run_benchmarks`:
+
+.. code-block:: python
+
+    from djangojs.benchmarks import generate_urlconf, run_benchmarks
+
+    for result in run_benchmarks(generate_urlconf(10000, depth=3, fanout=4)):
+        print(result)
+'''
+from __future__ import unicode_literals
+
+from djangojs.benchmarks.urlconf import generate_urlconf
+from djangojs.benchmarks.runner import BenchmarkResult, BENCHMARKS, run_benchmarks
+
+__all__ = (
+    'generate_urlconf',
+    'run_benchmarks',
+    'BenchmarkResult',
+    'BENCHMARKS',
+)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmarks runner.
+'''
+from __future__ import unicode_literals, division
+
+import gc
+import time
+
+from collections import namedtuple
+
+from djangojs.urls_serializer import urls_as_dict, urls_as_json, clear_urls_cache
+
+try:
+    import tracemalloc
+except ImportError:  # Python < 3.4
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+__all__ = ('BenchmarkResult', 'BENCHMARKS', 'run_benchmarks')
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+class BenchmarkResult(namedtuple('BenchmarkResult', 'name size runs best mean peak')):
+    '''
+    A benchmark timings (in seconds) and peak memory (in bytes, ``None`` if unavailable).
+
+    ``size`` is the number of serialized names, two by URL if namespaces have an ``app_name``.
+    '''
+    @property
+    def ops(self):
+        '''Operations per second'''
+        return 1 / self.mean if self.mean else float('inf')
+
+    def __str__(self):
+        peak = '{0:.1f} MB'.format(self.peak / 1024 / 1024) if self.peak is not None else 'n/a'
+        return '{0.name:<20} {0.size:>8} urls  {1:>10.2f} ops/s  best {2:>9.3f} ms  mean {3:>9.3f} ms  peak {4}'.format(
+            self, self.ops, self.best * 1000, self.mean * 1000, peak
+        )
+
+
+#: Benchmarked operations as ``(name, function, setup)``: ``setup`` is run before each (untimed) run
+BENCHMARKS = (
+    ('urls_as_dict', urls_as_dict, clear_urls_cache),
+    ('urls_as_json', urls_as_json, clear_urls_cache),
+    ('urls_as_dict cached', urls_as_dict, None),
+    ('urls_as_json cached', urls_as_json, None),
+)
+
+
+def _peak_memory(func, urlconf):
+    '''
+    Measure the peak memory allocated by a call with ``tracemalloc``.
+
+    Fallback on the process peak resident set size if not available (Python < 3.4).
+    '''
+    if tracemalloc:
+        tracemalloc.start()
+        try:
+            func(urlconf)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    func(urlconf)
+    if resource:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Kilobytes on Linux
+    return None
+
+
+def run_benchmarks(urlconf, runs=5, benchmarks=BENCHMARKS):
+    '''
+    Run benchmarks against an URLconf.
+
+    Yield a :class:`BenchmarkResult` for each benchmark.
+    '''
+    size = len(urls_as_dict(urlconf))
+    for name, func, setup in benchmarks:
+        timings = []
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(runs):
+                if setup:
+                    setup()
+                start = timer()
+                func(urlconf)
+                timings.append(timer() - start)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if setup:
+            setup()
+        peak = _peak_memory(func, urlconf)
+        yield BenchmarkResult(name, size, runs, min(timings), sum(timings) / runs, peak)
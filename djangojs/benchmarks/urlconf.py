@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+'''
+Synthetic URLconfs generation.
+'''
+from __future__ import unicode_literals
+
+import types
+
+from django.conf.urls import include, url
+
+__all__ = ('generate_urlconf', 'KINDS')
+
+#: Leaf patterns by kind, formatted with the pattern index
+KINDS = {
+    'plain': r'^page{0}/$',
+    'kwargs': r'^item{0}/(?P<pk>\d+)/(?P<slug>[\w-]+)/$',
+    'args': r'^archive{0}/(\d{{4}})/(\d{{2}})/$',
+    'optional': r'^list{0}/(?:page/(?P<page>\d+)/)?$',
+}
+
+DEFAULT_MIX = ('plain', 'kwargs', 'args', 'optional')
+
+
+def view(request, *args, **kwargs):
+    '''A dummy view shared by all generated patterns'''
+
+
+def generate_urlconf(size=1000, depth=1, fanout=10, namespaced=True, mix=DEFAULT_MIX):
+    '''
+    Generate an in-memory URLconf module.
+
+    :param size: the number of named leaf patterns
+    :param depth: the number of nested include levels
+    :param fanout: the number of includes by level
+    :param namespaced: give each include a namespace and an app_name
+    :param mix: the leaf patterns kinds (see :data:`KINDS`), used in turn
+    '''
+    leaves = fanout ** depth if depth else 1
+    patterns = [[] for _ in range(leaves)]
+    for idx in range(size):
+        regex = KINDS[mix[idx % len(mix)]].format(idx)
+        patterns[idx % leaves].append(url(regex, view, name='url{0}'.format(idx)))
+
+    # Build includes from the deepest level up to the root
+    for level in range(depth, 0, -1):
+        grouped = []
+        for group in range(len(patterns) // fanout):
+            children = []
+            for idx in range(fanout):
+                index = group * fanout + idx
+                if idx % 2:
+                    regex = r'^section{0}/(?P<section{1}>\d+)/'.format(index, level)
+                else:
+                    regex = r'^section{0}/'.format(index)
+                if namespaced:
+                    included = include(patterns[index], namespace='ns{0}'.format(index), app_name='app{0}'.format(idx))
+                else:
+                    included = include(patterns[index])
+                children.append(url(regex, included))
+            grouped.append(children)
+        patterns = grouped
+
+    name = 'djangojs_benchmark_{0}_{1}_{2}_{3}_{4}'.format(size, depth, fanout, int(namespaced), '_'.join(mix))
+    module = types.ModuleType(str(name))
+    module.urlpatterns = patterns[0]
+    return module
@@ -2,10 +2,20 @@
 from __future__ import unicode_literals
 
 import sys
+import threading
 
 from django.conf import settings as _settings
+from django.core.exceptions import ImproperlyConfigured
+from django.dispatch import receiver
+from django.utils import six
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.6
+    from django.test.signals import setting_changed
 
 from djangojs import JQUERY_DEFAULT_VERSION
+from djangojs.utils import NamesFilter, class_from_string
 
 # Default configuration values for Django.js
 # All values used by Django.js needs to appears here.
@@ -15,13 +25,24 @@ DEFAULTS = {
     'JS_CONTEXT_ENABLED': True,
     'JS_URLS_ENABLED': True,
     'JS_USER_ENABLED': True,
+    'JS_USER_PERMISSIONS_CACHE': None,
+    'JS_USER_PERMISSIONS_COMPACT': False,
     'JS_URLS': None,
     'JS_URLS_EXCLUDE': None,
     'JS_URLS_NAMESPACES': None,
     'JS_URLS_NAMESPACES_EXCLUDE': None,
     'JS_URLS_UNNAMED': False,
+    'JS_URLS_CACHE_SIZE': 32,
+    'JS_URLS_SHARDED': False,
+    'JS_URLS_PRELOAD': None,
+    'JS_URLS_COMPACT': False,
+    'JS_URLS_CACHE_DIR': None,
+    'JS_URLS_USAGE': None,
+    'JS_URLS_DYNAMIC': None,
     'JS_CONTEXT': None,
     'JS_CONTEXT_EXCLUDE': None,
+    'JS_CONTEXT_SOURCES': None,
+    'JS_CONTEXT_SCOPES': None,
     'JS_CONTEXT_PROCESSOR': 'djangojs.context_serializer.ContextSerializer',
     'JS_I18N_APPS': None,
     'JS_I18N_APPS_EXCLUDE': None,
@@ -31,6 +52,31 @@ DEFAULTS = {
 }
 
 
+#: Context variables scopes
+CONTEXT_SCOPES = GLOBAL, LANGUAGE, USER = 'global', 'language', 'user'
+
+#: Default context variables scopes, extended by ``settings.JS_CONTEXT_SCOPES``
+DEFAULT_CONTEXT_SCOPES = {
+    'STATIC_URL': GLOBAL,
+    'MEDIA_URL': GLOBAL,
+    'LANGUAGES': LANGUAGE,
+    'LANGUAGE_CODE': LANGUAGE,
+    'LANGUAGE_BIDI': LANGUAGE,
+    'LANGUAGE_NAME': LANGUAGE,
+    'LANGUAGE_NAME_LOCAL': LANGUAGE,
+}
+
+#: Default context variables sources (Django builtin context processors),
+#: extended by ``settings.JS_CONTEXT_SOURCES``
+DEFAULT_CONTEXT_SOURCES = {
+    'STATIC_URL': 'django.core.context_processors.static',
+    'MEDIA_URL': 'django.core.context_processors.media',
+    'LANGUAGES': 'django.core.context_processors.i18n',
+    'LANGUAGE_CODE': 'django.core.context_processors.i18n',
+    'LANGUAGE_BIDI': 'django.core.context_processors.i18n',
+}
+
+
 class DjangoJsSettings(object):
     '''
     Lazy Django settings wrapper for Django.js
@@ -47,3 +93,112 @@ class DjangoJsSettings(object):
             raise AttributeError("'%s' setting not found" % name)
 
 settings = DjangoJsSettings(_settings)
+
+#: Settings expecting a list of names (or ``None``)
+LIST_SETTINGS = (
+    'JS_URLS', 'JS_URLS_EXCLUDE', 'JS_URLS_NAMESPACES', 'JS_URLS_NAMESPACES_EXCLUDE', 'JS_URLS_DYNAMIC',
+    'JS_URLS_PRELOAD', 'JS_CONTEXT', 'JS_CONTEXT_EXCLUDE', 'JS_I18N_APPS', 'JS_I18N_APPS_EXCLUDE',
+)
+
+#: Settings compiled as :class:`~djangojs.utils.NamesFilter`
+FILTER_SETTINGS = ('JS_URLS', 'JS_URLS_EXCLUDE', 'JS_URLS_NAMESPACES', 'JS_URLS_NAMESPACES_EXCLUDE', 'JS_URLS_DYNAMIC')
+
+
+class DjangoJsConfig(object):
+    '''
+    A read-only snapshot of Django.js settings with precomputed values.
+
+    Settings are plain attributes (ie. ``config.JS_URLS_ENABLED``).
+    Use :func:`get_config` to get the current snapshot, rebuilt when settings change.
+    '''
+    def __init__(self, wrapped_settings):
+        values = dict((name, getattr(wrapped_settings, name, default)) for name, default in DEFAULTS.items())
+        for name in LIST_SETTINGS:
+            if values[name] is not None and not isinstance(values[name], (list, tuple, set, frozenset)):
+                raise ImproperlyConfigured('settings.%s should be a list, not %r' % (name, values[name]))
+        for name in 'JS_CONTEXT_SOURCES', 'JS_CONTEXT_SCOPES':
+            if values[name] is not None and not isinstance(values[name], dict):
+                raise ImproperlyConfigured('settings.%s should be a dict, not %r' % (name, values[name]))
+        middlewares = wrapped_settings.MIDDLEWARE_CLASSES
+        scopes = dict(DEFAULT_CONTEXT_SCOPES, **(values['JS_CONTEXT_SCOPES'] or {}))
+        for key, scope in scopes.items():
+            if scope not in CONTEXT_SCOPES:
+                raise ImproperlyConfigured('Unknown "%s" context variable scope: %r' % (key, scope))
+        for name in 'JS_URLS_CACHE_SIZE', 'JS_CACHE_DURATION':
+            if not isinstance(values[name], six.integer_types) or values[name] < 0:
+                raise ImproperlyConfigured('settings.%s should be a positive integer, not %r' % (name, values[name]))
+        self.__dict__.update(values)
+        self.__dict__.update(
+            #: Compiled names filters keyed by setting name
+            filters=dict((name, NamesFilter(values[name])) for name in FILTER_SETTINGS),
+            #: Context keys whitelist and blacklist as frozensets (or ``None``)
+            context=frozenset(values['JS_CONTEXT']) if values['JS_CONTEXT'] else None,
+            context_exclude=frozenset(values['JS_CONTEXT_EXCLUDE']) if values['JS_CONTEXT_EXCLUDE'] else None,
+            #: Declared context keys keyed by context processor dotted path
+            context_sources=_invert_sources(dict(DEFAULT_CONTEXT_SOURCES, **(values['JS_CONTEXT_SOURCES'] or {}))),
+            #: Context variables scopes keyed by name, default to ``user``
+            context_scopes=scopes,
+            #: Namespaces inlined with sharded URLs, including the unnamespaced URLs one
+            preload=frozenset(values['JS_URLS_PRELOAD'] or ()).union(('',)),
+            #: ``settings.LANGUAGES`` codes
+            languages=tuple(code for code, _ in wrapped_settings.LANGUAGES),
+            language_codes=frozenset(code for code, _ in wrapped_settings.LANGUAGES),
+            LANGUAGE_CODE=wrapped_settings.LANGUAGE_CODE,
+            ROOT_URLCONF=wrapped_settings.ROOT_URLCONF,
+            FORCE_SCRIPT_NAME=getattr(wrapped_settings, 'FORCE_SCRIPT_NAME', None),
+            CACHE_MIDDLEWARE_KEY_PREFIX=getattr(wrapped_settings, 'CACHE_MIDDLEWARE_KEY_PREFIX', ''),
+            #: Wether the session middleware is enabled (and thus ``request.user`` set)
+            sessions_enabled='django.contrib.sessions.middleware.SessionMiddleware' in middlewares,
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Django.js configuration is read-only')
+
+    @property
+    def context_processor(self):
+        '''
+        The ``settings.JS_CONTEXT_PROCESSOR`` class, imported on first access.
+        '''
+        try:
+            return self.__dict__['_context_processor']
+        except KeyError:
+            processor = self.__dict__['_context_processor'] = class_from_string(self.JS_CONTEXT_PROCESSOR)
+            return processor
+
+
+def _invert_sources(sources):
+    '''
+    Map context processors dotted paths to the context keys declared in ``settings.JS_CONTEXT_SOURCES``.
+    '''
+    keys = {}
+    for key, paths in sources.items():
+        for path in [paths] if isinstance(paths, six.string_types) else paths:
+            keys.setdefault(path, set()).add(key)
+    return dict((path, frozenset(names)) for path, names in keys.items())
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_config():
+    '''
+    Get the current :class:`DjangoJsConfig` snapshot.
+    '''
+    config = _config
+    if config is None:
+        with _config_lock:
+            config = _config or _build_config()
+    return config
+
+
+def _build_config():
+    global _config
+    _config = DjangoJsConfig(_settings)
+    return _config
+
+
+@receiver(setting_changed)
+def _on_setting_changed(**kwargs):
+    global _config
+    _config = None
@@ -1,13 +1,24 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import base64
+import hashlib
 import json
 import logging
+import uuid
 
-from django.template.context import RequestContext
+from django.core.cache import get_cache
+from django.dispatch import receiver
+from django.template.context import Context, get_standard_processors
 from django.utils import translation, six
+from django.utils.encoding import force_bytes
 
-from djangojs.conf import settings
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.6
+    from django.test.signals import setting_changed
+
+from djangojs.conf import get_config, GLOBAL, LANGUAGE, USER
 from djangojs.utils import LazyJsonEncoder
 
 logger = logging.getLogger(__name__)
@@ -15,10 +26,32 @@ logger = logging.getLogger(__name__)
 
 __all__ = (
     'ContextSerializer',
+    'PermissionsTable',
 )
 
 SERIALIZABLE_TYPES = six.string_types + six.integer_types + (six.text_type, tuple, list, dict, bool, set)
 
+#: Whether a context processor produces serialized keys, keyed by dotted path and scope
+_PROCESSORS_NEEDED = {}
+
+#: JSON encoded global and per-language context parts keyed by serializer class, scope and language
+_PARTS = {}
+
+#: Context keys serialization plans keyed by serializer class and scope
+_PLANS = {}
+
+#: Context processors dotted paths keyed by processor
+_PROCESSORS_PATHS = {}
+
+#: User permissions cache keys prefix
+PERMISSIONS_PREFIX = 'djangojs:permissions'
+
+#: Cache backends keyed by alias
+_CACHES = {}
+
+#: The permissions table (see ``settings.JS_USER_PERMISSIONS_COMPACT``)
+_PERMISSIONS = {}
+
 
 class ContextSerializer(object):
     '''
@@ -29,38 +62,84 @@ class ContextSerializer(object):
 
     To add a custom variable serialization handler,
     add a method named ``process_VARNAME(self, value, data)``.
+
+    Variables declared ``global`` or ``language`` in :ref:`settings.JS_CONTEXT_SCOPES <js-context-scopes>`
+    are only serialized once by process (and language) by :meth:`as_json`.
     '''
 
     def __init__(self, request):
         self.request = request
 
-    def as_dict(self):
+    def as_dict(self, scope=None):
         '''
         Serialize the context as a dictionnary from a given request.
+
+        Only the variables of the given ``scope`` (``global``, ``language`` or ``user``)
+        are serialized if specified, the user being part of the ``user`` scope.
         '''
         data = {}
-        if settings.JS_CONTEXT_ENABLED:
-            for context in RequestContext(self.request):
+        config = get_config()
+        if config.JS_CONTEXT_ENABLED:
+            plan = _get_plan(self.__class__, scope)
+            for context in self.iter_contexts(scope):
                 for key, value in six.iteritems(context):
-                    if settings.JS_CONTEXT and key not in settings.JS_CONTEXT:
-                        continue
-                    if settings.JS_CONTEXT_EXCLUDE and key in settings.JS_CONTEXT_EXCLUDE:
-                        continue
-                    handler_name = 'process_%s' % key
-                    if hasattr(self, handler_name):
-                        handler = getattr(self, handler_name)
-                        data[key] = handler(value, data)
-                    elif isinstance(value, SERIALIZABLE_TYPES):
-                        data[key] = value
-        if settings.JS_USER_ENABLED:
+                    try:
+                        handler = plan[key]
+                    except KeyError:
+                        handler = plan[key] = _compile_key(self.__class__, key, scope)
+                    if handler is None:
+                        if isinstance(value, SERIALIZABLE_TYPES):
+                            data[key] = value
+                    elif handler:
+                        data[key] = getattr(self, handler)(value, data)
+        if config.JS_USER_ENABLED and scope in (None, USER):
             self.handle_user(data)
         return data
 
+    def iter_contexts(self, scope=None):
+        '''
+        Iterate over the request context dictionnaries in the same order than ``RequestContext`` does
+        (last processor first, so the first one wins on duplicate keys)
+        but skip the context processors declared in ``settings.JS_CONTEXT_SOURCES``
+        which can't produce serialized keys (of a given ``scope``).
+
+        Undeclared processors are always run as their keys may vary between requests.
+        '''
+        contexts = []
+        for processor in get_standard_processors():
+            path = _get_processor_path(processor)
+            needed = _PROCESSORS_NEEDED.get((path, scope))
+            if needed is None:
+                needed = _is_processor_needed(path, scope)
+            if needed:
+                contexts.append(processor(self.request))
+        for context in reversed(contexts):
+            yield context
+        for context in Context():
+            yield context
+
     def as_json(self):
         '''
         Serialize the context as JSON.
+
+        The ``global`` and ``language`` scopes parts are serialized once
+        and merged with the ``user`` scope one without being decoded.
         '''
-        return json.dumps(self.as_dict(), cls=LazyJsonEncoder)
+        parts = [self.get_json_part(GLOBAL), self.get_json_part(LANGUAGE)]
+        parts.append(json.dumps(self.as_dict(USER), cls=LazyJsonEncoder)[1:-1])
+        return '{%s}' % ', '.join(part for part in parts if part)
+
+    def get_json_part(self, scope):
+        '''
+        Get the cached JSON encoded variables of a ``global`` or ``language`` scope,
+        without the enclosing braces.
+        '''
+        key = (self.__class__, scope, translation.get_language() if scope == LANGUAGE else None)
+        try:
+            return _PARTS[key]
+        except KeyError:
+            part = _PARTS[key] = json.dumps(self.as_dict(scope), cls=LazyJsonEncoder)[1:-1]
+            return part
 
     def process_LANGUAGES(self, languages, data):
         '''Serialize LANGUAGES as a localized dictionnary.'''
@@ -74,11 +153,11 @@ class ContextSerializer(object):
         # Dirty hack to fix non included default
         language_code = 'en-us' if language_code == 'en' else language_code
         language = translation.get_language_info('en' if language_code == 'en-us' else language_code)
-        if not settings.JS_CONTEXT or 'LANGUAGE_NAME' in settings.JS_CONTEXT \
-            or (settings.JS_CONTEXT_EXCLUDE and 'LANGUAGE_NAME' in settings.JS_CONTEXT_EXCLUDE):
+        config = get_config()
+        included, excluded = config.context, config.context_exclude
+        if not included or 'LANGUAGE_NAME' in included or (excluded and 'LANGUAGE_NAME' in excluded):
             data['LANGUAGE_NAME'] = language['name']
-        if not settings.JS_CONTEXT or 'LANGUAGE_NAME_LOCAL' in settings.JS_CONTEXT \
-            or (settings.JS_CONTEXT_EXCLUDE and 'LANGUAGE_NAME_LOCAL' in settings.JS_CONTEXT_EXCLUDE):
+        if not included or 'LANGUAGE_NAME_LOCAL' in included or (excluded and 'LANGUAGE_NAME_LOCAL' in excluded):
             data['LANGUAGE_NAME_LOCAL'] = language['name_local']
         return language_code
 
@@ -96,7 +175,8 @@ class ContextSerializer(object):
             'is_superuser': False,
             'permissions': tuple(),
         }
-        if 'django.contrib.sessions.middleware.SessionMiddleware' in settings.MIDDLEWARE_CLASSES:
+        config = get_config()
+        if config.sessions_enabled:
             user = self.request.user
             data['user']['is_authenticated'] = user.is_authenticated()
             if hasattr(user, 'username'):
@@ -108,4 +188,246 @@ class ContextSerializer(object):
             if hasattr(user, 'is_superuser'):
                 data['user']['is_superuser'] = user.is_superuser
             if hasattr(user, 'get_all_permissions'):
-                data['user']['permissions'] = tuple(user.get_all_permissions())
+                permissions = get_user_permissions(user)
+                if config.JS_USER_PERMISSIONS_COMPACT and data['user']['is_authenticated']:
+                    permissions = encode_permissions(permissions)
+                    if isinstance(permissions, six.string_types):
+                        data['user']['permissions_table'] = get_permissions_table().url
+                data['user']['permissions'] = permissions
+
+
+class PermissionsTable(object):
+    '''
+    The ``app_label.codename`` permissions names indexed by primary key
+    (see ``settings.JS_USER_PERMISSIONS_COMPACT``).
+
+    Positions being primary keys, encoded permissions stay valid when permissions are added or removed.
+    '''
+    __slots__ = ('names', 'index', 'payload', 'hash')
+
+    def __init__(self, permissions):
+        permissions = sorted(permissions)
+        #: Permissions names by primary key (``None`` for missing ones)
+        self.names = [None] * (permissions[-1][0] + 1 if permissions else 0)
+        for pk, name in permissions:
+            self.names[pk] = name
+        #: Primary keys by permission name
+        self.index = dict((name, pk) for pk, name in permissions)
+        #: The names JSON payload
+        self.payload = force_bytes(json.dumps(self.names, separators=(',', ':')))
+        #: The payload SHA-256 hexadecimal digest
+        self.hash = hashlib.sha256(self.payload).hexdigest()
+
+    @property
+    def url(self):
+        '''The ``django_js_permissions`` URL, versioned by hash'''
+        from djangojs.urls_serializer import fast_reverse
+        return '%s?v=%s' % (fast_reverse('django_js_permissions'), self.hash[:12])
+
+
+def get_user_permissions(user):
+    '''
+    Get a user permissions as a tuple.
+
+    Permissions are cached into the ``settings.JS_USER_PERMISSIONS_CACHE`` cache if set,
+    until the user, its groups or permissions change.
+    '''
+    alias = get_config().JS_USER_PERMISSIONS_CACHE
+    if not alias or user.pk is None:
+        return tuple(user.get_all_permissions())
+    cache = _get_cache(alias)
+    versions = [_get_version(cache, 'global'), _get_version(cache, user.pk)]
+    key = ':'.join([PERMISSIONS_PREFIX, 'user', str(user.pk)] + versions)
+    permissions = cache.get(key)
+    if permissions is None:
+        permissions = tuple(user.get_all_permissions())
+        cache.set(key, permissions)
+    return permissions
+
+
+def encode_permissions(permissions):
+    '''
+    Encode permissions as a base64 bitset of the :class:`PermissionsTable`
+    (bit ``n % 8`` of the byte ``n // 8`` stands for the permission whose primary key is ``n``).
+
+    Permissions are returned as is if some of them are not in the table.
+    '''
+    index = get_permissions_table().index
+    try:
+        positions = [index[permission] for permission in permissions]
+    except KeyError:
+        return permissions
+    bits = bytearray((max(positions) // 8 + 1) if positions else 0)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return base64.b64encode(bytes(bits)).decode('ascii')
+
+
+def invalidate_user_permissions(user_pk=None):
+    '''
+    Invalidate a user cached permissions or all users ones if ``user_pk`` is ``None``.
+    '''
+    alias = get_config().JS_USER_PERMISSIONS_CACHE
+    if alias:
+        _get_cache(alias).delete(_get_version_key('global' if user_pk is None else user_pk))
+
+
+def _on_permissions_change(sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs):
+    '''
+    Invalidate cached permissions on users, groups and permissions changes
+    (connected to ``post_save``, ``post_delete`` and ``m2m_changed``).
+    '''
+    config = get_config()
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        return
+    if _PERMISSIONS and config.JS_USER_PERMISSIONS_COMPACT:
+        from django.contrib.auth.models import Permission
+        if sender is Permission:
+            _PERMISSIONS.clear()
+    if not config.JS_USER_PERMISSIONS_CACHE:
+        return
+    from django.contrib.auth.models import Group, Permission
+    user_model = _get_user_model()
+    if sender is user_model:
+        invalidate_user_permissions(instance.pk)
+    elif sender in (Group, Permission, Group.permissions.through):
+        invalidate_user_permissions()
+    elif sender in _get_user_relations(user_model):
+        if not reverse:
+            invalidate_user_permissions(instance.pk)
+        elif pk_set:
+            for user_pk in pk_set:
+                invalidate_user_permissions(user_pk)
+        else:  # Reverse clear: affected users are unknown
+            invalidate_user_permissions()
+
+
+def _get_user_model():
+    try:
+        from django.contrib.auth import get_user_model
+    except ImportError:  # Django < 1.5
+        from django.contrib.auth.models import User
+        return User
+    return get_user_model()
+
+
+def _get_user_relations(user_model):
+    '''
+    Get the user model groups and permissions relations intermediary models.
+    '''
+    return tuple(
+        getattr(user_model, name).through for name in ('groups', 'user_permissions') if hasattr(user_model, name)
+    )
+
+
+def get_permissions_table(version=None):
+    '''
+    Get the :class:`PermissionsTable`, rebuilt when permissions change
+    or if its hash doesn't start with a given ``version`` (ie. built by another process).
+    '''
+    table = _PERMISSIONS.get('table')
+    if table is not None and (not version or table.hash.startswith(version)):
+        return table
+    from django.contrib.auth.models import Permission
+    permissions = Permission.objects.values_list('pk', 'content_type__app_label', 'codename')
+    table = _PERMISSIONS['table'] = PermissionsTable(
+        (pk, '%s.%s' % (app_label, codename)) for pk, app_label, codename in permissions
+    )
+    return table
+
+
+def _get_cache(alias):
+    try:
+        return _CACHES[alias]
+    except KeyError:
+        cache = _CACHES[alias] = get_cache(alias)
+        return cache
+
+
+def _get_version_key(name):
+    return '%s:version:%s' % (PERMISSIONS_PREFIX, name)
+
+
+def _get_version(cache, name):
+    '''
+    Get a permissions cache version.
+
+    Versions are random tokens instead of counters
+    so a dropped version never points to stale permissions once recreated.
+    '''
+    key = _get_version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex)
+        version = cache.get(key)
+    return version
+
+
+def _get_plan(cls, scope=None):
+    '''
+    Get a serializer class plan for a given ``scope``:
+    a dictionnary mapping context keys to their ``process_KEY`` handler name,
+    ``None`` if serialized as is or ``False`` if filtered out.
+
+    Keys are compiled on first use and plans are dropped on settings changes.
+    '''
+    try:
+        return _PLANS[cls, scope]
+    except KeyError:
+        plan = _PLANS[cls, scope] = {}
+        return plan
+
+
+def _compile_key(cls, key, scope=None):
+    '''
+    Compile a context key serialization for a serializer class and a given ``scope``.
+    '''
+    config = get_config()
+    included, excluded = config.context, config.context_exclude
+    if included and key not in included:
+        return False
+    if excluded and key in excluded:
+        return False
+    if scope and config.context_scopes.get(key, USER) != scope:
+        return False
+    handler_name = 'process_%s' % key
+    return handler_name if hasattr(cls, handler_name) else None
+
+
+def _get_processor_path(processor):
+    try:
+        return _PROCESSORS_PATHS[processor]
+    except KeyError:
+        path = _PROCESSORS_PATHS[processor] = '%s.%s' % (processor.__module__, processor.__name__)
+        return path
+
+
+def _is_processor_needed(path, scope=None):
+    '''
+    Wether a context processor may produce keys allowed by ``settings.JS_CONTEXT``
+    and ``settings.JS_CONTEXT_EXCLUDE`` (and belonging to ``scope`` if given).
+
+    Processors not declared in ``settings.JS_CONTEXT_SOURCES`` are always needed.
+    '''
+    config = get_config()
+    keys = config.context_sources.get(path)
+    if keys is None:
+        return True
+    included, excluded, scopes = config.context, config.context_exclude, config.context_scopes
+    needed = _PROCESSORS_NEEDED[path, scope] = any(
+        (not included or key in included) and not (excluded and key in excluded) and
+        (not scope or scopes.get(key, USER) == scope)
+        for key in keys
+    )
+    return needed
+
+
+@receiver(setting_changed)
+def _on_setting_changed(**kwargs):
+    _PROCESSORS_NEEDED.clear()
+    _PARTS.clear()
+    _PLANS.clear()
+    _CACHES.clear()
+    _PERMISSIONS.clear()
+    if kwargs['setting'] == 'TEMPLATE_CONTEXT_PROCESSORS':
+        _PROCESSORS_PATHS.clear()
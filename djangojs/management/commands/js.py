@@ -14,7 +14,10 @@ except:
 
 from djangojs.management.commands.js_localize import LocalizeParser
 from djangojs.management.commands.js_launcher import LauncherParser
+from djangojs.management.commands.js_benchmark import BenchmarkParser
 from djangojs.management.commands.js_bower import BowerParser
+from djangojs.management.commands.js_scan import ScanParser
+from djangojs.management.commands.js_urls import UrlsParser
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +28,12 @@ class Command(BaseCommand):
     requires_model_validation = False
     can_import_settings = True
     subparsers = (
+        BenchmarkParser,
         BowerParser,
         LauncherParser,
         LocalizeParser,
+        ScanParser,
+        UrlsParser,
     )
 
     def usage(self, subcommand):
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from djangojs.management.commands.subparser import Subparser
+
+
+class BenchmarkParser(Subparser):
+    '''
+    A command benchmarking the URLs serializer against synthetic URLconfs.
+    '''
+    name = 'benchmark'
+    help = 'Benchmark the URLs serialization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', '-s', dest='sizes', type=int, action='append', default=[],
+            help='Number of generated URL patterns (default: 1000 and 10000). Use multiple times to run more.')
+        parser.add_argument('--depth', '-d', type=int, default=2, help='Nested includes levels (default: 2)')
+        parser.add_argument('--fanout', '-f', type=int, default=5, help='Includes by level (default: 5)')
+        parser.add_argument('--no-namespaces', dest='namespaced', action='store_false',
+            help='Do not give namespaces to includes')
+        parser.add_argument('--mix', '-m', default='plain,kwargs,args,optional',
+            help='Comma separated patterns kinds to generate (default: "plain,kwargs,args,optional")')
+        parser.add_argument('--runs', '-r', type=int, default=5, help='Runs by benchmark (default: 5)')
+
+    def handle(self, args):
+        from djangojs.benchmarks import generate_urlconf, run_benchmarks
+
+        mix = tuple(kind.strip() for kind in args.mix.split(','))
+        for size in args.sizes or (1000, 10000):
+            urlconf = generate_urlconf(size, args.depth, args.fanout, args.namespaced, mix)
+            for result in run_benchmarks(urlconf, args.runs):
+                self.stdout.write(str(result))
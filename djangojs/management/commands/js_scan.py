@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import re
+
+from os.path import dirname, exists
+
+from django.core.management.base import CommandError
+from djangojs.management.commands.subparser import Subparser
+
+#: Pattern matching URLs names given as string literals to ``url()``, ``absolute()`` and ``site()`` calls
+RE_URL_CALL = re.compile(r'''\.(?:url|absolute|site)\s*\(\s*(['"])([\w:.\-]+)\1''')
+
+
+class ScanParser(Subparser):
+    '''
+    A command listing the URLs names referenced from static javascript files.
+    '''
+    name = 'scan'
+    help = 'Scan static javascript files for the URLs names they use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('patterns', nargs='*', default=['*.js'],
+            help='Static files patterns to scan (default to *.js)')
+        parser.add_argument('--exclude', '-e', action='append', default=[],
+            help='Static files pattern to exclude. Use multiple times to exclude more.')
+        parser.add_argument('--output', '-o', help='The manifest file (default to settings.JS_URLS_USAGE)')
+
+    def handle(self, args):
+        from django.contrib.staticfiles import finders
+        from django.contrib.staticfiles.utils import matches_patterns
+        from djangojs.conf import settings
+        from djangojs.utils import StorageGlobber
+
+        output = args.output or settings.JS_URLS_USAGE
+        if not output:
+            raise CommandError('settings.JS_URLS_USAGE is not set. Use --output to specify the manifest file')
+
+        names = set()
+        paths = [path for path in StorageGlobber.glob(args.patterns) if not matches_patterns(path, args.exclude)]
+        for path in sorted(set(paths)):
+            with io.open(finders.find(path), encoding='utf-8', errors='replace') as js_file:
+                names.update(match.group(2) for match in RE_URL_CALL.finditer(js_file.read()))
+
+        if dirname(output) and not exists(dirname(output)):
+            os.makedirs(dirname(output))
+        with open(output, 'w') as out:
+            json.dump(sorted(names), out, indent=4, separators=(',', ': '))
+            out.write('\n')
+        self.stdout.write('Found {0} URLs names in {1} files: {2}'.format(len(names), len(set(paths)), output))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+
+from os.path import exists, join
+
+from django.core.management.base import CommandError
+from djangojs.management.commands.subparser import Subparser
+
+#: Name of the file mapping exported files names to their hashed names
+MANIFEST = 'urls.manifest.json'
+
+
+class UrlsParser(Subparser):
+    '''
+    A command exporting the URLs mapping as static files.
+    '''
+    name = 'urls'
+    help = 'Export the URLs mapping as static JSON and javascript files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='The target directory (default to settings.STATIC_ROOT)')
+        parser.add_argument('--urlconf', '-u', help='The URLconf to export (default to settings.ROOT_URLCONF)')
+        parser.add_argument('--language', '-l', dest='languages', action='append', default=[],
+            help='Export the mapping for the given language (e.g. pt-br). Use multiple times to export more.')
+        parser.add_argument('--all', '-a', action='store_true',
+            help='Export the mapping for all languages in settings.LANGUAGES.')
+
+    def handle(self, args):
+        from django.utils import translation
+        from djangojs.conf import settings
+        from djangojs.urls_serializer import get_urls_entry
+
+        output = args.output or settings.STATIC_ROOT
+        if not output:
+            raise CommandError('settings.STATIC_ROOT is not set. Use --output to specify the target directory')
+        if not exists(output):
+            os.makedirs(output)
+
+        languages = [code for code, _ in settings.LANGUAGES] if args.all else args.languages
+        manifest_filename = join(output, MANIFEST)
+        manifest = {}
+        if exists(manifest_filename):
+            with open(manifest_filename) as manifest_file:
+                manifest = json.load(manifest_file)
+
+        for language in languages or [None]:
+            basename = 'urls.{0}'.format(language) if language else 'urls'
+            if language:
+                with translation.override(language):
+                    entry = get_urls_entry(args.urlconf)
+            else:
+                entry = get_urls_entry(args.urlconf)
+            contents = {
+                'json': entry.payload,
+                'js': b''.join((b'window.DJANGO_JS_URLS = ', entry.payload, b';\n')),
+            }
+            for extension, content in contents.items():
+                filename = '{0}.{1}.{2}'.format(basename, entry.hash[:12], extension)
+                with open(join(output, filename), 'wb') as out:
+                    out.write(content)
+                manifest['{0}.{1}'.format(basename, extension)] = filename
+                self.stdout.write('Exported {0}'.format(join(output, filename)))
+
+        with open(manifest_filename, 'w') as out:
+            json.dump(manifest, out, indent=4, sort_keys=True, separators=(',', ': '))
+            out.write('\n')
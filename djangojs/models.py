@@ -1 +1,9 @@
 # -*- coding: utf-8 -*-
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from djangojs.context_serializer import _on_permissions_change
+
+# Connected to all senders so swapped user models are supported,
+# senders are filtered when the permissions cache is enabled.
+for signal in post_save, post_delete, m2m_changed:
+    signal.connect(_on_permissions_change, dispatch_uid='djangojs_permissions')
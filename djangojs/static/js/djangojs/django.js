@@ -26,6 +26,10 @@
             } else {
                 this.urls = params.urls || window.DJANGO_JS_URLS;
             }
+            this.shards = $.extend({}, params.shards || window.DJANGO_JS_URLS_SHARDS);
+            $.each(params.preload || [], function(idx, namespace) {
+                Django.load_urls(namespace);
+            });
             if (typeof params.context === 'string' || params.context instanceof String) {
                 $.get(params.context, function(context) {
                     Django.set_context(context);
@@ -36,18 +40,75 @@
         },
 
         set_context: function(context) {
+            var lookup, source, size;
             this.context = context;
             this.user = context.user;
             if (this.user) {
+                if (typeof this.user.permissions === 'string') {
+                    this.user.permissions = this._decode_permissions(
+                        this.user.permissions,
+                        this.load_permissions(this.user.permissions_table)
+                    );
+                }
                 /**
                  * Equivalent to ``User.has_perm`` function.
                  */
                 this.user.has_perm = function(permission) {
-                    return this.permissions.indexOf(permission) > -1;
+                    // Build the lookup once, unless the permissions array changed
+                    if (source !== this.permissions || size !== this.permissions.length) {
+                        source = this.permissions;
+                        size = source.length;
+                        lookup = {};
+                        for (var i = 0; i < size; i++) {
+                            lookup[source[i]] = true;
+                        }
+                    }
+                    return lookup[permission] === true;
                 };
             }
         },
 
+        /**
+         * Synchronously load a permissions table (``settings.JS_USER_PERMISSIONS_COMPACT``)
+         * if not already loaded.
+         */
+        load_permissions: function(url) {
+            if (!this._permissions_tables[url]) {
+                $.ajax({
+                    url: url,
+                    dataType: 'json',
+                    async: false,
+                    success: function(table) {
+                        Django._permissions_tables[url] = table;
+                    }
+                });
+            }
+            return this._permissions_tables[url] || [];
+        },
+
+        /**
+         * Loaded permissions tables keyed by URL.
+         */
+        _permissions_tables: {},
+
+        /**
+         * Decode a base64 permissions bitset into an array
+         * given the permissions table indexed by bit position.
+         */
+        _decode_permissions: function(bitset, table) {
+            var bytes = window.atob(bitset),
+                permissions = [];
+            for (var i = 0; i < bytes.length; i++) {
+                var byte = bytes.charCodeAt(i);
+                for (var bit = 0; bit < 8; bit++) {
+                    if (byte & (1 << bit) && table[i * 8 + bit]) {
+                        permissions.push(table[i * 8 + bit]);
+                    }
+                }
+            }
+            return permissions;
+        },
+
         /**
          * Reload context and user
          */
@@ -60,11 +121,66 @@
             });
         },
 
+        /**
+         * Synchronously load the URLs of a namespace shard if not already loaded.
+         */
+        load_urls: function(namespace) {
+            var url = this.shards[namespace];
+            if (!url) {
+                return;
+            }
+            delete this.shards[namespace];
+            $.ajax({
+                url: url,
+                dataType: 'json',
+                async: false,
+                success: function(urls) {
+                    Django.urls = $.extend({}, Django._expand(Django.urls), Django._expand(urls));
+                }
+            });
+        },
+
+        /**
+         * Expand a compact URLs mapping (``[prefixes, urls]`` flat arrays) into an object.
+         */
+        _expand: function(urls) {
+            if (!$.isArray(urls)) {
+                return urls;
+            }
+            var prefixes = urls[0],
+                entries = urls[1],
+                strings = [],
+                expanded = {},
+                idx, parent;
+
+            for (idx = 0; idx < prefixes.length; idx += 2) {
+                parent = prefixes[idx];
+                strings.push((parent < 0 ? '' : strings[parent]) + prefixes[idx + 1]);
+            }
+            for (idx = 0; idx < entries.length; idx += 3) {
+                parent = entries[idx + 1];
+                expanded[entries[idx]] = (parent < 0 ? '' : strings[parent]) + entries[idx + 2];
+            }
+            return expanded;
+        },
+
+        /**
+         * Get an URL pattern, loading its namespace shard if needed.
+         */
+        _pattern: function(name) {
+            var idx = name.indexOf(':');
+            this.urls = this._expand(this.urls);
+            if (!this.urls[name] && idx > 0) {
+                this.load_urls(name.slice(0, idx));
+            }
+            return this.urls[name];
+        },
+
         /**
          * Equivalent to ``reverse`` function and ``url`` template tag.
          */
         url: function(name, args) {
-            var pattern = this.urls[name] || false,
+            var pattern = this._pattern(name) || false,
                 url = pattern,
                 key, regex, token, parts;
 
@@ -90,10 +90,81 @@ describe("Django.js", function() {
                 expect(Django.context).toEqual(context);
             });
 
+            it('with a "preload" attribute containing namespaces to load', function() {
+                var shards = {'ns': '/urls/ns', 'other': '/urls/other'};
+                spyOn($, "ajax").andCallFake(function(params) {
+                    expect(params.url).toEqual('/urls/ns');
+                    expect(params.async).toBe(false);
+                    params.success({'ns:my-url': '/ns/my-url'});
+                });
+
+                Django.initialize({urls: {}, shards: shards, preload: ['ns']});
+
+                expect($.ajax.callCount).toBe(1);
+                expect(Django.urls).toEqual({'ns:my-url': '/ns/my-url'});
+                expect(Django.shards).toEqual({'other': '/urls/other'});
+            });
+
         });
 
     })
 
+    describe('URLs shards', function() {
+        afterEach(function() {
+            Django.initialize();
+        });
+
+        it('are loaded on first resolution of a namespaced URL', function() {
+            spyOn($, "ajax").andCallFake(function(params) {
+                expect(params.url).toEqual('/urls/ns');
+                params.success({'ns:my-url': '/ns/my-url'});
+            });
+
+            Django.initialize({urls: {'my-url': '/my-url'}, shards: {'ns': '/urls/ns'}});
+
+            expect(Django.url('ns:my-url')).toBe('/ns/my-url');
+            expect(Django.url('ns:my-url')).toBe('/ns/my-url');
+            expect(Django.url('my-url')).toBe('/my-url');
+            expect($.ajax.callCount).toBe(1);
+        });
+
+        it('are not fetched for unknown namespaces', function() {
+            spyOn($, "ajax");
+
+            Django.initialize({urls: {}, shards: {'ns': '/urls/ns'}});
+
+            expect(function() { Django.url('unknown:my-url'); }).toThrow();
+            expect($.ajax).not.toHaveBeenCalled();
+        });
+    });
+
+    describe('Compact URLs', function() {
+        afterEach(function() {
+            Django.initialize();
+        });
+
+        it('are expanded on first resolution', function() {
+            var compact = [[-1, '/', 0, 'api/<org>/'], ['home', 0, '', 'tasks', 1, 'tasks/', 'members', 1, 'members/']];
+
+            Django.initialize({urls: compact});
+
+            expect(Django.urls).toBe(compact);
+            expect(Django.url('tasks', 'org')).toBe('/api/org/tasks/');
+            expect(Django.urls).toEqual({'home': '/', 'tasks': '/api/<org>/tasks/', 'members': '/api/<org>/members/'});
+        });
+
+        it('can be loaded as shards', function() {
+            spyOn($, "ajax").andCallFake(function(params) {
+                params.success([[], ['ns:my-url', -1, '/ns/my-url']]);
+            });
+
+            Django.initialize({urls: [[], ['my-url', -1, '/my-url']], shards: {'ns': '/urls/ns'}});
+
+            expect(Django.url('ns:my-url')).toBe('/ns/my-url');
+            expect(Django.url('my-url')).toBe('/my-url');
+        });
+    });
+
     describe('Context', function() {
         it('have a context attribute', function() {
             expect(Django.context).toBeDefined();
@@ -393,6 +464,21 @@ describe("Django.js", function() {
             it('deny permission if not present in permissions', function() {
                 expect(Django.user.has_perm('fake.something_else')).toBeFalsy();
             });
+
+            it('decode compact permissions', function() {
+                var context = Django.context;
+                Django._permissions_tables['/permissions?v=1'] = [
+                    'app.add', 'app.change', 'app.delete', 'other.add', 'other.change',
+                    'other.delete', 'third.add', 'third.change', 'third.delete'
+                ];
+                Django.set_context({
+                    user: {permissions: 'BQE=', permissions_table: '/permissions?v=1'}
+                });
+                expect(Django.user.permissions).toEqual(['app.add', 'app.delete', 'third.delete']);
+                expect(Django.user.has_perm('app.delete')).toBeTruthy();
+                expect(Django.user.has_perm('app.change')).toBeFalsy();
+                Django.set_context(context);
+            });
         });
 
         describe('When settings.JS_USER_ENABLED=False', function() {
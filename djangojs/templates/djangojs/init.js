@@ -1,4 +1,5 @@
 (function(){
 window.DJANGO_JS_URLS = {{ urls|safe }};
-window.DJANGO_JS_CONTEXT = {{ context|safe }};
+{% if shards %}window.DJANGO_JS_URLS_SHARDS = {{ shards|safe }};
+{% endif %}window.DJANGO_JS_CONTEXT = {{ context|safe }};
 }());
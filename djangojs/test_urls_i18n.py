@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from django.conf.urls import patterns, url, include
+from django.conf.urls.i18n import i18n_patterns
+from django.utils import six
+from django.utils.functional import lazy
+from django.utils.translation import get_language
+from django.views.generic import TemplateView
+
+view = TemplateView.as_view(template_name='djangojs/test/test1.html')
+
+ABOUT = {'fr': r'^a-propos/$', 'en': r'^about/$'}
+
+
+def translated_about():
+    # Behave like a translated regex without requiring a catalog
+    return ABOUT.get((get_language() or 'en')[:2], ABOUT['en'])
+
+
+urlpatterns = patterns('',
+    url(r'^djangojs/', include('djangojs.urls')),
+    url(r'^static/$', view, name='not_localized'),
+)
+
+urlpatterns += i18n_patterns('',
+    url(r'^home/$', view, name='home'),
+    url(lazy(translated_about, six.text_type)(), view, name='about'),
+)
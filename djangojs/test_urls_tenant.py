@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+from django.conf.urls import patterns, url, include
+from django.views.generic import TemplateView
+
+
+urlpatterns = patterns('',
+    url(r'^djangojs/', include('djangojs.urls')),
+    url(r'^tenant/(?P<slug>[\w-]+)/$', TemplateView.as_view(template_name='djangojs/test/test1.html'), name='tenant'),
+)
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 # pylint: disable=W0401
 from __future__ import unicode_literals
+from .test_benchmarks import *
+from .test_commands import *
 from .test_context import *
 from .test_globber import *
 from .test_javascript import *
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.test import TestCase
+
+from djangojs.benchmarks import generate_urlconf, run_benchmarks, BenchmarkResult, BENCHMARKS
+from djangojs.urls_serializer import urls_as_dict, clear_urls_cache
+
+
+class GenerateUrlconfTest(TestCase):
+    def setUp(self):
+        clear_urls_cache()
+
+    def test_size(self):
+        '''It should generate the requested number of patterns'''
+        urls = urls_as_dict(generate_urlconf(100, depth=2, fanout=3, namespaced=False))
+        self.assertEqual(len(urls), 100)
+        self.assertEqual(urls['url0'], '/section0/section0/page0/')
+
+    def test_namespaces(self):
+        '''It should give namespaces and app_names to includes'''
+        urls = urls_as_dict(generate_urlconf(10, depth=1, fanout=2))
+        self.assertEqual(urls['ns1:url1'], '/section1/<section1>/item1/<pk>/<slug>/')
+        self.assertEqual(urls['app1:url1'], urls['ns1:url1'])
+
+    def test_mix(self):
+        '''It should generate the requested patterns kinds'''
+        urls = urls_as_dict(generate_urlconf(4, depth=0, mix=('args', 'optional')))
+        self.assertEqual(urls['url0'], '/archive0/<>/<>/')
+        self.assertEqual(urls['url1'], '/list1/')
+
+    def test_same_parameters_same_module(self):
+        '''It should name modules after their parameters'''
+        self.assertEqual(generate_urlconf(10).__name__, generate_urlconf(10).__name__)
+        self.assertNotEqual(generate_urlconf(10).__name__, generate_urlconf(20).__name__)
+
+
+class RunBenchmarksTest(TestCase):
+    def test_run(self):
+        '''It should report each benchmark'''
+        results = list(run_benchmarks(generate_urlconf(20, depth=1, fanout=2, namespaced=False), runs=2))
+        self.assertEqual([result.name for result in results], [name for name, _, _ in BENCHMARKS])
+        for result in results:
+            self.assertIsInstance(result, BenchmarkResult)
+            self.assertEqual(result.size, 20)
+            self.assertEqual(result.runs, 2)
+            self.assertLessEqual(result.best, result.mean)
+            self.assertGreater(result.ops, 0)
+            self.assertIn(result.name, str(result))
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import shutil
+import tempfile
+
+from os.path import exists, join
+
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+
+from djangojs.management.commands.js import Command
+from djangojs.urls_serializer import urls_as_json_bytes, urls_hash
+
+
+class CommandTestMixin(object):
+    def run_command(self, *argv):
+        command = Command()
+        command.stdout = StringIO()
+        args = command.create_parser('manage.py', 'js').parse_args(argv)
+        args.func(args)
+        return command.stdout.getvalue()
+
+
+class UrlsCommandTest(CommandTestMixin, TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def read(self, filename):
+        with open(join(self.output, filename), 'rb') as f:
+            return f.read()
+
+    def manifest(self):
+        return json.loads(self.read('urls.manifest.json').decode('utf-8'))
+
+    def test_export(self):
+        '''Should export hashed JSON and javascript files'''
+        self.run_command('urls', '-o', self.output)
+        basename = 'urls.{0}'.format(urls_hash()[:12])
+        payload = urls_as_json_bytes()
+
+        self.assertEqual(self.read(basename + '.json'), payload)
+        self.assertEqual(self.read(basename + '.js'), b'window.DJANGO_JS_URLS = ' + payload + b';\n')
+        self.assertEqual(self.manifest(), {
+            'urls.json': basename + '.json',
+            'urls.js': basename + '.js',
+        })
+
+    def test_export_languages(self):
+        '''Should export a mapping by language'''
+        self.run_command('urls', '-o', self.output, '-l', 'fr', '-l', 'en')
+        manifest = self.manifest()
+        self.assertEqual(sorted(manifest.keys()), ['urls.en.js', 'urls.en.json', 'urls.fr.js', 'urls.fr.json'])
+        for filename in manifest.values():
+            self.assertTrue(exists(join(self.output, filename)))
+
+    @override_settings(LANGUAGES=(('fr', 'French'), ('en', 'English')))
+    def test_export_all_languages(self):
+        '''Should export a mapping for all settings.LANGUAGES'''
+        self.run_command('urls', '-o', self.output, '--all')
+        self.assertEqual(sorted(self.manifest().keys()), ['urls.en.js', 'urls.en.json', 'urls.fr.js', 'urls.fr.json'])
+
+    def test_export_update_manifest(self):
+        '''Should update an existing manifest'''
+        self.run_command('urls', '-o', self.output, '-l', 'fr')
+        self.run_command('urls', '-o', self.output)
+        self.assertEqual(sorted(self.manifest().keys()), ['urls.fr.js', 'urls.fr.json', 'urls.js', 'urls.json'])
+
+    def test_export_urlconf(self):
+        '''Should export the given URLconf'''
+        self.run_command('urls', '-o', self.output, '-u', 'djangojs.test_urls_tenant')
+        urls = json.loads(self.read(self.manifest()['urls.json']).decode('utf-8'))
+        self.assertIn('tenant', urls)
+
+    @override_settings(STATIC_ROOT=None)
+    def test_export_requires_output(self):
+        '''Should fail without output directory nor STATIC_ROOT'''
+        with self.assertRaises(CommandError):
+            self.run_command('urls')
+
+
+class ScanCommandTest(CommandTestMixin, TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.manifest = join(self.output, 'usage', 'urls.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def names(self):
+        with open(self.manifest) as f:
+            return json.load(f)
+
+    def test_scan(self):
+        '''Should list the URLs names used from static javascript files'''
+        self.run_command('scan', '-o', self.manifest)
+        names = self.names()
+        self.assertEqual(names, sorted(names))
+        self.assertIn('django_js_context', names)
+        self.assertIn('ns:my-url', names)
+
+    def test_scan_patterns(self):
+        '''Should only scan the matching static files'''
+        self.run_command('scan', 'js/djangojs/django.js', '-o', self.manifest)
+        self.assertIn('django_js_context', self.names())
+        self.assertNotIn('ns:my-url', self.names())
+
+    def test_scan_exclude(self):
+        '''Should not scan the excluded static files'''
+        self.run_command('scan', '-e', 'js/test/*', '-o', self.manifest)
+        self.assertIn('django_js_context', self.names())
+        self.assertNotIn('ns:my-url', self.names())
+
+    @override_settings(JS_URLS_USAGE=None)
+    def test_scan_requires_output(self):
+        '''Should fail without output file nor JS_URLS_USAGE'''
+        with self.assertRaises(CommandError):
+            self.run_command('scan')
@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import base64
 import json
 
 from django import VERSION as DJANGO_VERSION
 from django.conf import global_settings
 from django.contrib.auth.management import create_permissions
-from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser, User, Group, Permission
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.management import update_contenttypes
 from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import get_cache
+from django.core.exceptions import ImproperlyConfigured
 from django.core.urlresolvers import reverse
 from django.db.models import get_app
 from django.middleware.locale import LocaleMiddleware
@@ -19,7 +23,9 @@ from django.utils import translation
 from django.utils import unittest
 
 from djangojs.conf import settings
-from djangojs.utils import class_from_string
+from djangojs.context_serializer import ContextSerializer, get_user_permissions, encode_permissions, _PLANS
+from djangojs.context_serializer import get_permissions_table, _is_processor_needed, _PERMISSIONS
+from djangojs.utils import class_from_string, LazyJsonEncoder
 
 TEST_CONTEXT_PROCESSORS = global_settings.TEMPLATE_CONTEXT_PROCESSORS + (
     'djangojs.tests.custom_processor',
@@ -288,3 +294,427 @@ class ContextJsonViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/json')
         self.assertIsNotNone(json.loads(response.content.decode()))
+
+
+COUNTED_CALLS = []
+
+
+def counting_processor(request):
+    '''A context processor counting its calls'''
+    COUNTED_CALLS.append(request)
+    return {'COUNTED': len(COUNTED_CALLS)}
+
+
+def first_processor(request):
+    return {'KEY': 'first'}
+
+
+def second_processor(request):
+    return {'KEY': 'second'}
+
+
+def varying_processor(request):
+    '''A context processor whose keys depend on the request'''
+    context = {'SITE': 'site'}
+    if 'notifs' in request.GET:
+        context['NOTIFS'] = 3
+    return context
+
+
+@override_settings(
+    TEMPLATE_CONTEXT_PROCESSORS=TEST_CONTEXT_PROCESSORS + ('djangojs.tests.test_context.counting_processor',),
+    MIDDLEWARE_CLASSES=TEST_MIDDLEWARES,
+)
+class ContextProcessorsSelectionTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        del COUNTED_CALLS[:]
+
+    def serialize(self):
+        request = self.factory.get(reverse('django_js_context'))
+        SessionMiddleware().process_request(request)
+        request.user = User.objects.create_user('user', 'fake@noirbizarre.info', 'password')
+        data = class_from_string(settings.JS_CONTEXT_PROCESSOR)(request).as_dict()
+        User.objects.all().delete()
+        return data
+
+    def test_run_needed_processors(self):
+        '''Should run processors producing serialized keys'''
+        self.assertEqual(self.serialize()['COUNTED'], 1)
+        self.assertEqual(self.serialize()['COUNTED'], 2)
+
+    def test_run_undeclared_processors(self):
+        '''Should always run processors not declared in JS_CONTEXT_SOURCES'''
+        for name in 'JS_CONTEXT', 'JS_CONTEXT_EXCLUDE':
+            del COUNTED_CALLS[:]
+            with override_settings(**{name: ['STATIC_URL'] if name == 'JS_CONTEXT' else ['COUNTED']}):
+                self.serialize()
+                self.assertIn('STATIC_URL', self.serialize())
+            self.assertEqual(len(COUNTED_CALLS), 2)
+
+    @override_settings(TEMPLATE_CONTEXT_PROCESSORS=(
+        'djangojs.tests.test_context.first_processor',
+        'djangojs.tests.test_context.second_processor',
+    ))
+    def test_processors_precedence(self):
+        '''Should give precedence to the first processor like RequestContext does'''
+        self.assertEqual(self.serialize()['KEY'], 'first')
+
+    @override_settings(
+        TEMPLATE_CONTEXT_PROCESSORS=TEST_CONTEXT_PROCESSORS + ('djangojs.tests.test_context.varying_processor',),
+        JS_CONTEXT=['NOTIFS', 'STATIC_URL'],
+    )
+    def test_varying_processors(self):
+        '''Should serialize undeclared processors keys depending on the request'''
+        self.assertNotIn('NOTIFS', self.serialize())
+        request = self.factory.get(reverse('django_js_context'), {'notifs': 1})
+        SessionMiddleware().process_request(request)
+        request.user = User.objects.create_user('user', 'fake@noirbizarre.info', 'password')
+        self.assertEqual(class_from_string(settings.JS_CONTEXT_PROCESSOR)(request).as_dict()['NOTIFS'], 3)
+
+    @override_settings(JS_CONTEXT=['STATIC_URL'], JS_CONTEXT_SOURCES={
+        'COUNTED': 'djangojs.tests.test_context.counting_processor',
+        'STATIC_URL': ['django.core.context_processors.static'],
+    })
+    def test_declared_sources(self):
+        '''Should never run processors whose declared keys are not whitelisted'''
+        self.assertIn('STATIC_URL', self.serialize())
+        self.assertEqual(COUNTED_CALLS, [])
+
+
+@override_settings(
+    TEMPLATE_CONTEXT_PROCESSORS=TEST_CONTEXT_PROCESSORS + ('djangojs.tests.test_context.counting_processor',),
+    MIDDLEWARE_CLASSES=TEST_MIDDLEWARES,
+)
+class ContextScopesTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        del COUNTED_CALLS[:]
+
+    def serializer(self):
+        request = self.factory.get(reverse('django_js_context'))
+        SessionMiddleware().process_request(request)
+        request.user = User.objects.create_user('user', 'fake@noirbizarre.info', 'password')
+        serializer = class_from_string(settings.JS_CONTEXT_PROCESSOR)(request)
+        User.objects.all().delete()
+        return serializer
+
+    def test_same_content(self):
+        '''Should serialize the same variables as as_dict()'''
+        serializer = self.serializer()
+        result = json.loads(serializer.as_json())
+        expected = json.loads(json.dumps(serializer.as_dict(), cls=LazyJsonEncoder))
+        expected['COUNTED'] = result['COUNTED']
+        self.assertEqual(result, expected)
+        self.assertIn('STATIC_URL', result)
+        self.assertIn('LANGUAGE_NAME', result)
+        self.assertIn('user', result)
+
+    @override_settings(
+        JS_CONTEXT_SCOPES={'COUNTED': 'global'},
+        JS_CONTEXT_SOURCES={'COUNTED': 'djangojs.tests.test_context.counting_processor'},
+    )
+    def test_global_scope(self):
+        '''Should serialize global variables once'''
+        self.assertEqual(json.loads(self.serializer().as_json())['COUNTED'], 1)
+        self.assertEqual(json.loads(self.serializer().as_json())['COUNTED'], 1)
+        self.assertEqual(len(COUNTED_CALLS), 1)
+
+    @override_settings(
+        JS_CONTEXT_SCOPES={'COUNTED': 'language'},
+        JS_CONTEXT_SOURCES={'COUNTED': 'djangojs.tests.test_context.counting_processor'},
+    )
+    def test_language_scope(self):
+        '''Should serialize per-language variables once by language'''
+        for language in 'fr', 'en', 'fr':
+            with translation.override(language):
+                result = json.loads(self.serializer().as_json())
+                self.assertTrue(result['LANGUAGE_CODE'].startswith(language))
+        self.assertEqual(len(COUNTED_CALLS), 2)
+
+    def test_user_scope(self):
+        '''Should serialize undeclared variables on each call'''
+        first = json.loads(self.serializer().as_json())['COUNTED']
+        self.assertEqual(json.loads(self.serializer().as_json())['COUNTED'], first + 1)
+
+    def test_builtin_sources(self):
+        '''Should only run Django builtin processors for their scopes'''
+        for path, scope in (('static', 'global'), ('media', 'global'), ('i18n', 'language')):
+            path = 'django.core.context_processors.%s' % path
+            self.assertTrue(_is_processor_needed(path, scope))
+            self.assertFalse(_is_processor_needed(path, 'user'))
+
+    @override_settings(JS_CONTEXT_SOURCES={'STATIC_URL': 'djangojs.tests.custom_processor'})
+    def test_extend_builtin_sources(self):
+        '''Should extend the builtin processors sources'''
+        self.assertTrue(_is_processor_needed('django.core.context_processors.static', 'user'))
+        self.assertFalse(_is_processor_needed('django.core.context_processors.media', 'user'))
+
+    @override_settings(JS_CONTEXT_SCOPES={'COUNTED': 'session'})
+    def test_unknown_scope(self):
+        '''Should reject unknown scopes'''
+        with self.assertRaises(ImproperlyConfigured):
+            self.serializer().as_json()
+
+
+@override_settings(
+    TEMPLATE_CONTEXT_PROCESSORS=TEST_CONTEXT_PROCESSORS,
+    MIDDLEWARE_CLASSES=TEST_MIDDLEWARES,
+    JS_CONTEXT_PROCESSOR='djangojs.tests.CustomContextProcessor',
+)
+class SerializationPlanTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def serializer(self, cls=None):
+        request = self.factory.get(reverse('django_js_context'))
+        SessionMiddleware().process_request(request)
+        request.user = User.objects.create_user('user', 'fake@noirbizarre.info', 'password')
+        serializer = (cls or class_from_string(settings.JS_CONTEXT_PROCESSOR))(request)
+        User.objects.all().delete()
+        return serializer
+
+    def test_compiled_once(self):
+        '''Should compile each key once by class and scope'''
+        from djangojs.tests import CustomContextProcessor
+        self.serializer().as_dict()
+        plan = _PLANS[CustomContextProcessor, None]
+        self.assertEqual(plan['CUSTOM'], 'process_CUSTOM')
+        self.assertEqual(plan['LANGUAGE_CODE'], 'process_LANGUAGE_CODE')
+        self.assertIsNone(plan['STATIC_URL'])
+        self.serializer().as_dict()
+        self.assertIs(_PLANS[CustomContextProcessor, None], plan)
+
+    def test_per_class(self):
+        '''Should compile a plan for each serializer class'''
+        result = self.serializer(ContextSerializer).as_dict()
+        self.assertEqual(result['CUSTOM'], 'CUSTOM_VALUE')
+        result = self.serializer().as_dict()
+        self.assertEqual(result['CUSTOM'], 'MODIFIED CUSTOM VALUE')
+
+    def test_filtered(self):
+        '''Should mark filtered out keys'''
+        from djangojs.tests import CustomContextProcessor
+        with override_settings(JS_CONTEXT_EXCLUDE=['CUSTOM']):
+            self.assertNotIn('CUSTOM', self.serializer().as_dict())
+            self.assertIs(_PLANS[CustomContextProcessor, None]['CUSTOM'], False)
+        self.assertIn('CUSTOM', self.serializer().as_dict())
+
+    def test_scope(self):
+        '''Should compile a plan for each scope'''
+        from djangojs.tests import CustomContextProcessor
+        self.serializer().as_dict('global')
+        self.assertIsNone(_PLANS[CustomContextProcessor, 'global']['STATIC_URL'])
+        self.assertIs(_PLANS[CustomContextProcessor, 'global'].get('CUSTOM', False), False)
+
+
+@override_settings(JS_USER_PERMISSIONS_CACHE='default')
+class UserPermissionsCacheTest(TestCase):
+    def setUp(self):
+        get_cache('default').clear()
+        self.user = User.objects.create_user('user', 'fake@noirbizarre.info', 'password')
+        self.group = Group.objects.create(name='group')
+        self.permission = Permission.objects.get(codename='add_user')
+        self.other_permission = Permission.objects.get(codename='change_user')
+
+    def get_permissions(self):
+        # Permissions are cached on user instances too
+        return sorted(get_user_permissions(User.objects.get(pk=self.user.pk)))
+
+    def assertCached(self, permissions):
+        self.assertEqual(self.get_permissions(), permissions)
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(sorted(get_user_permissions(user)), permissions)
+
+    def test_cached(self):
+        '''Should cache the user permissions'''
+        self.user.user_permissions.add(self.permission)
+        self.assertCached(['auth.add_user'])
+
+    def test_without_get_user_model(self):
+        '''Should invalidate permissions on Django < 1.5 (no get_user_model())'''
+        from django.contrib import auth
+        get_user_model = auth.__dict__.pop('get_user_model', None)
+        try:
+            self.assertCached([])
+            self.user.user_permissions.add(self.permission)
+            self.assertCached(['auth.add_user'])
+        finally:
+            if get_user_model:
+                auth.get_user_model = get_user_model
+
+    @override_settings(JS_USER_PERMISSIONS_CACHE=None)
+    def test_disabled(self):
+        '''Should not cache permissions without cache alias'''
+        self.get_permissions()
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(2):
+            get_user_permissions(user)
+
+    def test_user_permissions_change(self):
+        '''Should invalidate on user permissions change'''
+        self.assertCached([])
+        self.user.user_permissions.add(self.permission)
+        self.assertCached(['auth.add_user'])
+        self.permission.user_set.remove(self.user)
+        self.assertCached([])
+
+    def test_user_groups_change(self):
+        '''Should invalidate on user groups change'''
+        self.group.permissions.add(self.permission)
+        self.assertCached([])
+        self.user.groups.add(self.group)
+        self.assertCached(['auth.add_user'])
+        self.group.user_set.clear()
+        self.assertCached([])
+
+    def test_group_permissions_change(self):
+        '''Should invalidate on group permissions change'''
+        self.user.groups.add(self.group)
+        self.assertCached([])
+        self.group.permissions.add(self.permission, self.other_permission)
+        self.assertCached(['auth.add_user', 'auth.change_user'])
+        self.other_permission.delete()
+        self.assertCached(['auth.add_user'])
+
+    def test_user_change(self):
+        '''Should invalidate on user change'''
+        self.user.user_permissions.add(self.permission)
+        self.assertCached(['auth.add_user'])
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertIn('auth.change_user', self.get_permissions())
+
+    def test_other_users(self):
+        '''Should only invalidate the changed user'''
+        other = User.objects.create_user('other', 'other@noirbizarre.info', 'password')
+        self.assertCached([])
+        other.user_permissions.add(self.permission)
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_permissions(user), ())
+
+
+def decode_permissions(bitset, table):
+    '''Decode a permissions bitset like the client does'''
+    permissions = []
+    for idx, byte in enumerate(bytearray(base64.b64decode(bitset))):
+        for bit in range(8):
+            if byte & (1 << bit):
+                permissions.append(table[idx * 8 + bit])
+    return permissions
+
+
+@override_settings(
+    JS_USER_PERMISSIONS_COMPACT=True,
+    TEMPLATE_CONTEXT_PROCESSORS=TEST_CONTEXT_PROCESSORS,
+    MIDDLEWARE_CLASSES=TEST_MIDDLEWARES,
+)
+class CompactPermissionsTest(TestCase):
+    def serialize(self, user):
+        request = RequestFactory().get(reverse('django_js_context'))
+        SessionMiddleware().process_request(request)
+        request.user = user
+        return json.loads(class_from_string(settings.JS_CONTEXT_PROCESSOR)(request).as_json())
+
+    def get_table(self, user=None, version=None):
+        if user:
+            self.client.login(username=user.username, password='password')
+        return self.client.get(reverse('django_js_permissions'), {'v': version} if version else {})
+
+    def test_table(self):
+        '''Should index permissions names by primary key'''
+        table = get_permissions_table()
+        self.assertEqual(len([name for name in table.names if name]), Permission.objects.count())
+        permission = Permission.objects.get(codename='add_user')
+        self.assertEqual(table.names[permission.pk], 'auth.add_user')
+        self.assertEqual(table.index['auth.add_user'], permission.pk)
+
+    def test_not_in_context(self):
+        '''Should not serialize the table into the context'''
+        result = self.serialize(User.objects.create_superuser('admin', 'fake@noirbizarre.info', 'password'))
+        self.assertNotIn('PERMISSIONS', result)
+
+    def test_superuser(self):
+        '''Should encode permissions as a bitset of the table'''
+        user = User.objects.create_superuser('admin', 'fake@noirbizarre.info', 'password')
+        result = self.serialize(user)
+        self.assertTrue(isinstance(result['user']['permissions'], six.string_types))
+        self.assertEqual(result['user']['permissions_table'], get_permissions_table().url)
+        table = get_permissions_table().names
+        self.assertEqual(decode_permissions(result['user']['permissions'], table), [name for name in table if name])
+
+    def test_some_permissions(self):
+        '''Should only encode the user permissions'''
+        user = User.objects.create_user('user', 'fake@noirbizarre.info', 'password')
+        user.user_permissions.add(*Permission.objects.filter(codename__in=['add_user', 'delete_group']))
+        result = self.serialize(User.objects.get(pk=user.pk))
+        self.assertEqual(
+            sorted(decode_permissions(result['user']['permissions'], get_permissions_table().names)),
+            ['auth.add_user', 'auth.delete_group']
+        )
+
+    def test_anonymous(self):
+        '''Should not encode anonymous users permissions'''
+        result = self.serialize(AnonymousUser())
+        self.assertEqual(result['user']['permissions'], [])
+        self.assertNotIn('permissions_table', result['user'])
+
+    def test_no_permissions(self):
+        '''Should encode no permissions as an empty string'''
+        self.assertEqual(encode_permissions(()), '')
+
+    def test_unknown_permissions(self):
+        '''Should not encode permissions missing from the table'''
+        permissions = ('auth.add_user', 'custom.perm')
+        self.assertEqual(encode_permissions(permissions), permissions)
+
+    def test_new_permission(self):
+        '''Should rebuild the table when permissions change, previous bitsets staying valid'''
+        user = User.objects.create_superuser('admin', 'fake@noirbizarre.info', 'password')
+        previous = self.serialize(user)
+        content_type = ContentType.objects.get_for_model(User)
+        Permission.objects.create(codename='zzz_user', name='ZZZ', content_type=content_type)
+        result = self.serialize(User.objects.get(pk=user.pk))
+        self.assertNotEqual(result['user']['permissions_table'], previous['user']['permissions_table'])
+        table = get_permissions_table().names
+        self.assertIn('auth.zzz_user', decode_permissions(result['user']['permissions'], table))
+        self.assertEqual(
+            decode_permissions(previous['user']['permissions'], table),
+            [name for name in table if name and name != 'auth.zzz_user']
+        )
+
+    def test_view(self):
+        '''Should serve the table to authenticated users'''
+        response = self.get_table(User.objects.create_user('user', 'fake@noirbizarre.info', 'password'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), get_permissions_table().names)
+        self.assertEqual(response['ETag'], '"%s"' % get_permissions_table().hash)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_view_outdated(self):
+        '''Should rebuild a table outdated by another process for a newer version'''
+        user = User.objects.create_user('user', 'fake@noirbizarre.info', 'password')
+        outdated = get_permissions_table()
+        content_type = ContentType.objects.get_for_model(User)
+        Permission.objects.create(codename='zzz_user', name='ZZZ', content_type=content_type)
+        version = get_permissions_table().hash[:12]
+        _PERMISSIONS['table'] = outdated  # As in a process not notified of the change
+        response = self.get_table(user, version)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('auth.zzz_user', json.loads(response.content.decode('utf-8')))
+
+    def test_view_unknown_version(self):
+        '''Should not serve a table not matching the requested version'''
+        response = self.get_table(User.objects.create_user('user', 'fake@noirbizarre.info', 'password'), 'unknown')
+        self.assertEqual(response.status_code, 404)
+
+    def test_view_anonymous(self):
+        '''Should not serve the table to anonymous users'''
+        self.assertEqual(self.get_table().status_code, 403)
+
+    @override_settings(JS_USER_PERMISSIONS_COMPACT=False)
+    def test_view_disabled(self):
+        '''Should not serve the table without settings.JS_USER_PERMISSIONS_COMPACT'''
+        self.assertEqual(self.get_table(User.objects.create_user('user', 'f@k.e', 'password')).status_code, 404)
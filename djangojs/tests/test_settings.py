@@ -1,5 +1,9 @@
+from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
 from django.test.utils import override_settings
+
+from djangojs.conf import get_config
+from djangojs.context_serializer import ContextSerializer
 from djangojs.urls import js_info_dict
 
 
@@ -33,3 +37,49 @@ class I18nExcludeTest(TestCase):
     def test_not_exclude_translation(self):
         '''Should not exlude apps not listed in JS_I18N_EXCLUDE'''
         self.assertIn('djangojs.fake', self.packages)
+
+
+class ConfigTest(TestCase):
+    def test_defaults(self):
+        '''Should expose settings with their default values'''
+        config = get_config()
+        self.assertTrue(config.JS_URLS_ENABLED)
+        self.assertIsNone(config.JS_URLS)
+        self.assertFalse(config.filters['JS_URLS'])
+        self.assertIs(config.context_processor, ContextSerializer)
+
+    def test_read_only(self):
+        '''Should not be modified'''
+        with self.assertRaises(AttributeError):
+            get_config().JS_URLS_ENABLED = False
+
+    def test_rebuilt_on_change(self):
+        '''Should be rebuilt when settings change'''
+        config = get_config()
+        self.assertIs(get_config(), config)
+        with override_settings(JS_URLS=['ns:*'], JS_CONTEXT=['STATIC_URL'], JS_URLS_PRELOAD=['ns']):
+            self.assertIsNot(get_config(), config)
+            self.assertIn('ns:name', get_config().filters['JS_URLS'])
+            self.assertEqual(get_config().context, frozenset(['STATIC_URL']))
+            self.assertEqual(get_config().preload, frozenset(['', 'ns']))
+        self.assertFalse(get_config().filters['JS_URLS'])
+
+    @override_settings(JS_CONTEXT_PROCESSOR='djangojs.tests.CustomContextProcessor')
+    def test_context_processor(self):
+        '''Should resolve the context processor class'''
+        from djangojs.tests import CustomContextProcessor
+        self.assertIs(get_config().context_processor, CustomContextProcessor)
+
+    def test_sessions_enabled(self):
+        '''Should check the session middleware once'''
+        with override_settings(MIDDLEWARE_CLASSES=['django.contrib.sessions.middleware.SessionMiddleware']):
+            self.assertTrue(get_config().sessions_enabled)
+        with override_settings(MIDDLEWARE_CLASSES=[]):
+            self.assertFalse(get_config().sessions_enabled)
+
+    def test_validation(self):
+        '''Should reject invalid settings'''
+        with override_settings(JS_URLS='name'):
+            self.assertRaises(ImproperlyConfigured, get_config)
+        with override_settings(JS_URLS_CACHE_SIZE='32'):
+            self.assertRaises(ImproperlyConfigured, get_config)
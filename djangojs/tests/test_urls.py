@@ -1,10 +1,30 @@
+import hashlib
 import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
 
+from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
-from django.core.urlresolvers import reverse
+from django.core.urlresolvers import reverse, clear_url_caches, set_urlconf, NoReverseMatch
+from django.core.urlresolvers import get_script_prefix, set_script_prefix
 from django.test import TestCase
+from django.test.client import RequestFactory
 from django.test.utils import override_settings
-from django.utils import six
+from django.utils import six, translation
+
+from djangojs.urls_serializer import urls_as_dict, urls_as_json, urls_as_json_bytes, urls_hash, clear_urls_cache
+from djangojs.urls_serializer import urls_as_compact_json, CompactUrlsCacheEntry, fast_reverse, preload_urls
+from djangojs.urls_serializer import iter_urls, iter_urls_json, urls_stats
+from djangojs.urls_serializer import _compile_template, _get_callback_name, get_urls_entry
+from djangojs.views import UrlsJsonView, JsInitView
+from djangojs import urls_serializer
+from djangojs.test_urls import unnamed, TestFormView, fake_patterns
+from djangojs.utils import NamesFilter
 
 
 class UrlsTestMixin(object):
@@ -153,6 +173,27 @@ class UrlsTestMixin(object):
         self.assertNotIn('django_js_urls', self.result)
         self.assertIn('test_arg', self.result)
 
+    @override_settings(JS_URLS=['ns2:*', 'test_*_multi'])
+    def test_urls_whitelist_patterns(self):
+        '''Should include urls matching glob-style patterns or qualified names in JS_URLS'''
+        self.result = self.get_result()  # To take override_settings in account
+        self.assertIn('ns2:nested:fake', self.result)
+        self.assertIn('ns2:appnested:fake', self.result)
+        self.assertIn('test_arg_multi', self.result)
+        self.assertIn('test_named_multi', self.result)
+        self.assertNotIn('ns1:fake', self.result)
+        self.assertNotIn('test_arg', self.result)
+
+    @override_settings(JS_URLS_EXCLUDE=['ns2:*:fake', 'test_arg*'])
+    def test_urls_blacklist_patterns(self):
+        '''Should exclude urls matching glob-style patterns or qualified names in JS_URLS_EXCLUDE'''
+        self.result = self.get_result()  # To take override_settings in account
+        self.assertNotIn('ns2:nested:fake', self.result)
+        self.assertNotIn('test_arg', self.result)
+        self.assertNotIn('test_arg_multi', self.result)
+        self.assertIn('app2:nested:fake', self.result)
+        self.assertIn('ns1:fake', self.result)
+
     @override_settings(JS_URLS_NAMESPACES=['ns1'])
     def test_urls_namespaces_whitelist(self):
         '''Should only include namespaces listed in JS_URLS_NAMESPACES'''
@@ -167,6 +208,15 @@ class UrlsTestMixin(object):
         self.assertNotIn('ns1:fake', self.result)
         self.assertIn('ns2:nested:fake', self.result)
 
+    @override_settings(JS_URLS_NAMESPACES=['ns2', 'ns2:*'])
+    def test_urls_namespaces_whitelist_patterns(self):
+        '''Should include namespaces matching glob-style patterns in JS_URLS_NAMESPACES'''
+        self.result = self.get_result()  # To take override_settings in account
+        self.assertIn('ns2:nested:fake', self.result)
+        self.assertIn('ns2:appnested:fake', self.result)
+        self.assertNotIn('app2:nested:fake', self.result)
+        self.assertNotIn('ns1:fake', self.result)
+
     @override_settings(JS_URLS_ENABLED=False)
     def test_urls_disabled(self):
         '''Should be empty if settings.JS_URLS_ENABLED is False'''
@@ -200,6 +250,30 @@ class UrlsAsJsonTest(UrlsTestMixin, TestCase):
         return json.loads(urls_as_json())
 
 
+class IterUrlsTest(UrlsTestMixin, TestCase):
+
+    def get_result(self):
+        return dict(iter_urls())
+
+    def test_lazy(self):
+        '''It should yield URLs while walking the URLconf'''
+        urls = iter_urls()
+        self.assertEqual(next(urls), ('djangojs_tests', '/'))
+        self.assertEqual(next(urls), ('django_js_init', '/djangojs/init.js'))
+
+    def test_not_cached(self):
+        '''It should not build nor cache the URLs mapping'''
+        clear_urls_cache()
+        list(iter_urls())
+        self.assertEqual(len(urls_serializer._URLS_CACHE), 0)
+
+
+class IterUrlsJsonTest(UrlsTestMixin, TestCase):
+
+    def get_result(self):
+        return json.loads(''.join(iter_urls_json()))
+
+
 class UrlsJsonViewTest(UrlsTestMixin, TestCase):
 
     def get_result(self):
@@ -213,6 +287,10 @@ class UrlsJsonViewTest(UrlsTestMixin, TestCase):
         self.assertEqual(self.response['Content-Type'], 'application/json')
         self.assertIsNotNone(self.result)
 
+    def test_etag(self):
+        '''It should use the URLs hash as ETag'''
+        self.assertEqual(self.response['ETag'], '"%s"' % urls_hash())
+
     @override_settings(JS_CACHE_DURATION=0)
     def test_force_script_name(self):
         from django.core.urlresolvers import set_script_prefix, _prefixes
@@ -225,3 +303,864 @@ class UrlsJsonViewTest(UrlsTestMixin, TestCase):
 
         result = json.loads(response.content.decode())
         self.assertEqual(result['django_js_urls'], '/force_script/djangojs/urls')
+
+
+class UrlsShardsTest(TestCase):
+    urls = 'djangojs.test_urls'
+
+    def setUp(self):
+        clear_urls_cache()
+
+    def test_shards(self):
+        '''It should split the mapping by top-level namespace'''
+        entry = get_urls_entry()
+        self.assertIn('', entry.shards)
+        self.assertIn('app1', entry.shards)
+        self.assertIn('app2', entry.shards)
+        self.assertEqual(entry.shards['app1'].urls, {'app1:fake': '/test/namespace1/fake'})
+        self.assertIn('app2:nested:fake', entry.shards['app2'].urls)
+        self.assertNotIn(':', ''.join(entry.shards[''].urls))
+        merged = {}
+        for shard in entry.shards.values():
+            merged.update(shard.urls)
+        self.assertEqual(merged, entry.urls)
+
+    def test_shards_payload(self):
+        '''It should merge shards payloads'''
+        entry = get_urls_entry()
+        self.assertEqual(json.loads(entry.shards_payload(entry.shards.keys()).decode()), entry.urls)
+        self.assertEqual(json.loads(entry.shards_payload(['app1', 'unknown']).decode()), entry.shards['app1'].urls)
+        self.assertEqual(entry.shards_payload([]), b'{}')
+
+    def test_shard_view(self):
+        '''It should render a namespace shard with its own ETag'''
+        response = self.client.get(reverse('django_js_urls_shard', kwargs={'namespace': 'app1'}))
+        self.assertEqual(response.status_code, 200)
+        shard = get_urls_entry().shards['app1']
+        self.assertEqual(json.loads(response.content.decode()), shard.urls)
+        self.assertEqual(response['ETag'], '"%s"' % shard.hash)
+
+    def test_shard_view_unknown(self):
+        '''It should raise a 404 on unknown namespace'''
+        response = self.client.get(reverse('django_js_urls_shard', kwargs={'namespace': 'unknown'}))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(JS_URLS_SHARDED=True)
+    def test_init_sharded(self):
+        '''It should only inline non-namespaced URLs and reference the shards'''
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        context = JsInitView(request=request).get_context_data()
+        entry = get_urls_entry()
+        self.assertEqual(json.loads(context['urls']), entry.shards[''].urls)
+        shards = json.loads(context['shards'])
+        self.assertEqual(sorted(shards.keys()), sorted(ns for ns in entry.shards if ns))
+        self.assertEqual(shards['app1'], '%s?v=%s' % (
+            reverse('django_js_urls_shard', kwargs={'namespace': 'app1'}),
+            entry.shards['app1'].hash[:12]
+        ))
+
+    @override_settings(JS_URLS_SHARDED=True, JS_URLS_PRELOAD=['app1'])
+    def test_init_sharded_preload(self):
+        '''It should inline preloaded namespaces'''
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        context = JsInitView(request=request).get_context_data()
+        urls = json.loads(context['urls'])
+        self.assertIn('app1:fake', urls)
+        self.assertNotIn('app2:nested:fake', urls)
+        self.assertNotIn('app1', json.loads(context['shards']))
+
+    def test_init_not_sharded(self):
+        '''It should inline the whole mapping by default'''
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        context = JsInitView(request=request).get_context_data()
+        self.assertEqual(context['urls'], urls_as_json())
+        self.assertNotIn('shards', context)
+
+
+def expand_compact(compact):
+    '''Expand a compact URLs mapping like Django.js does'''
+    prefixes, entries = compact
+    strings = []
+    for idx in range(0, len(prefixes), 2):
+        parent = prefixes[idx]
+        strings.append((strings[parent] if parent >= 0 else '') + prefixes[idx + 1])
+    return dict(
+        (entries[idx], (strings[entries[idx + 1]] if entries[idx + 1] >= 0 else '') + entries[idx + 2])
+        for idx in range(0, len(entries), 3)
+    )
+
+
+class CompactUrlsTest(TestCase):
+    urls = 'djangojs.test_urls'
+
+    def setUp(self):
+        clear_urls_cache()
+
+    def test_round_trip(self):
+        '''It should expand to the flat mapping'''
+        self.assertEqual(expand_compact(json.loads(urls_as_compact_json())), urls_as_dict())
+
+    def test_shared_prefixes(self):
+        '''It should only reference prefixes shared by several URLs'''
+        entry = CompactUrlsCacheEntry({
+            'a': '/api/v2/org/<org>/projects/<project>/tasks/',
+            'b': '/api/v2/org/<org>/projects/<project>/members/',
+            'c': '/api/v2/org/<org>/',
+            'd': '/other/page',
+            'e': '',
+        })
+        prefixes, entries = json.loads(entry.payload.decode())
+        self.assertEqual(prefixes, [-1, '/', 0, 'api/v2/org/<org>/', 1, 'projects/<project>/'])
+        self.assertEqual(entries, ['e', -1, '', 'c', 1, '', 'b', 2, 'members/', 'a', 2, 'tasks/', 'd', 0, 'other/page'])
+        self.assertEqual(expand_compact([prefixes, entries]), entry.urls)
+
+    def test_compact_entry(self):
+        '''It should be cached and hashed separately'''
+        entry = get_urls_entry()
+        self.assertIs(entry.compact, entry.compact)
+        self.assertIs(entry.compact.compact, entry.compact)
+        self.assertEqual(entry.compact.urls, entry.urls)
+        self.assertNotEqual(entry.compact.hash, entry.hash)
+        self.assertIsInstance(entry.compact.shards['app1'], CompactUrlsCacheEntry)
+
+    @override_settings(JS_URLS_COMPACT=True, JS_CACHE_DURATION=0)
+    def test_view(self):
+        '''It should serve the compact format'''
+        response = self.client.get(reverse('django_js_urls'))
+        self.assertEqual(expand_compact(json.loads(response.content.decode())), urls_as_dict())
+        self.assertEqual(response['ETag'], '"%s"' % get_urls_entry().compact.hash)
+
+    @override_settings(JS_URLS_COMPACT=True)
+    def test_init(self):
+        '''It should inline the compact format'''
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        context = JsInitView(request=request).get_context_data()
+        self.assertEqual(context['urls'], urls_as_compact_json())
+
+
+@override_settings(LANGUAGES=(('en', 'English'), ('fr', 'French')), JS_CACHE_DURATION=0)
+class LocalizedUrlsTest(TestCase):
+    urls = 'djangojs.test_urls_i18n'
+
+    def setUp(self):
+        clear_urls_cache()
+
+    def test_language_prefix(self):
+        '''It should use the active language prefix'''
+        with translation.override('fr'):
+            self.assertEqual(urls_as_dict()['home'], '/fr/home/')
+        with translation.override('en'):
+            self.assertEqual(urls_as_dict()['home'], '/en/home/')
+        self.assertEqual(urls_as_dict()['not_localized'], '/static/')
+
+    def test_translated_regex(self):
+        '''It should compile translated regexes for the active language'''
+        with translation.override('fr'):
+            self.assertEqual(urls_as_dict()['about'], '/fr/a-propos/')
+            self.assertIn(('about', '/fr/a-propos/'), list(iter_urls()))
+        with translation.override('en'):
+            self.assertEqual(urls_as_dict()['about'], '/en/about/')
+            self.assertIn(('about', '/en/about/'), list(iter_urls()))
+
+    def test_fast_reverse(self):
+        '''It should reverse for the active language'''
+        for language in ('fr', 'en'):
+            with translation.override(language):
+                self.assertEqual(fast_reverse('about'), reverse('about'))
+                self.assertEqual(fast_reverse('home'), reverse('home'))
+
+    def test_cached_by_language(self):
+        '''It should build one mapping by language'''
+        with translation.override('fr'):
+            fr = get_urls_entry()
+        with translation.override('en'):
+            en = get_urls_entry()
+        self.assertIsNot(fr, en)
+        with translation.override('fr'):
+            self.assertIs(get_urls_entry(), fr)
+        with translation.override('en'):
+            self.assertIs(get_urls_entry(), en)
+
+    def test_language_variant(self):
+        '''It should share the mapping of the generic language listed in settings.LANGUAGES'''
+        with translation.override('fr'):
+            fr = get_urls_entry()
+        with translation.override('fr-ca'):
+            self.assertIs(get_urls_entry(), fr)
+            self.assertEqual(urls_as_dict()['home'], '/fr/home/')
+
+    def test_not_localized(self):
+        '''It should share the mapping between languages if not localized'''
+        with translation.override('fr'):
+            fr = get_urls_entry('djangojs.test_urls')
+        with translation.override('en'):
+            self.assertIs(get_urls_entry('djangojs.test_urls'), fr)
+
+    def test_views(self):
+        '''It should serve the request language mapping'''
+        for language, about in (('fr', '/fr/a-propos/'), ('en', '/en/about/')):
+            response = self.client.get(reverse('django_js_urls'), HTTP_ACCEPT_LANGUAGE=language)
+            self.assertEqual(json.loads(response.content.decode())['about'], about)
+            response = self.client.get(reverse('django_js_init'), HTTP_ACCEPT_LANGUAGE=language)
+            self.assertIn(about, response.content.decode())
+
+
+class FakeAppResolver(object):
+    '''Mimic a django-cms AppRegexURLResolver resolving its patterns on access'''
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.resolved = 0
+
+    @property
+    def url_patterns(self):
+        self.resolved += 1
+        return self.patterns
+
+
+class CmsApphookTest(TestCase):
+    urls = 'djangojs.test_urls'
+
+    def setUp(self):
+        clear_urls_cache()
+        self.resolver = FakeAppResolver(fake_patterns)
+        self.nodes = ((urls_serializer.APPHOOK, None, self.resolver),)
+
+    def expand(self):
+        return dict(urls_serializer._expand(self.nodes, '/cms/', None))
+
+    def test_expand(self):
+        '''It should expand apphooks patterns with the parent prefix'''
+        self.assertEqual(self.expand()['fake'], '/cms/fake')
+
+    def test_compiled_once(self):
+        '''It should only resolve apphooks patterns once'''
+        self.expand()
+        self.expand()
+        self.assertEqual(self.resolver.resolved, 1)
+
+    def test_cms_change(self):
+        '''It should resolve apphooks and rebuild mappings again after a django-cms change'''
+        entry = get_urls_entry()
+        self.expand()
+        urls_serializer._on_cms_change()
+        self.expand()
+        self.assertEqual(self.resolver.resolved, 2)
+        self.assertIsNot(get_urls_entry(), entry)
+
+    def test_cms_change_urlconfs(self):
+        '''It should recompile URLconfs holding the apphooks resolvers after a django-cms change'''
+        get_urls_entry()
+        self.assertTrue(urls_serializer._URLCONFS)
+        urls_serializer._on_cms_change()
+        self.assertFalse(urls_serializer._URLCONFS)
+        self.assertFalse(urls_serializer._LOCALIZED)
+
+
+class FastReverseTest(TestCase):
+    urls = 'djangojs.test_urls'
+
+    def setUp(self):
+        clear_urls_cache()
+
+    def assertReversed(self, name, *args, **kwargs):
+        '''Check that fast_reverse() gives the same result than reverse() using a plan'''
+        self.assertIsNotNone(get_urls_entry().plans[name])
+        self.assertEqual(fast_reverse(name, *args, **kwargs), reverse(name, args=args, kwargs=kwargs))
+
+    def test_without_argument(self):
+        self.assertReversed('test_form')
+        self.assertReversed('escaped')
+
+    def test_args(self):
+        self.assertReversed('test_arg', 41)
+        self.assertReversed('test_arg_multi', 41, 'x')
+        self.assertReversed('test_named', 'value')
+
+    def test_kwargs(self):
+        self.assertReversed('test_named', test='value')
+        self.assertReversed('test_named_multi', str='value', num=41)
+        self.assertReversed('test_named_nested', test='1,2,3')
+
+    def test_quoting(self):
+        self.assertReversed('test_named', six.u('caf\xe9'))
+        self.assertReversed('test_named_nested', test='1,2')
+
+    def test_namespaces(self):
+        self.assertReversed('ns1:fake')
+        self.assertReversed('app1:fake')
+        self.assertReversed('ns2:nested:fake')
+        self.assertReversed('app2:appnested:fake')
+
+    def test_fallback(self):
+        '''It should fall back on reverse() for lossy or ambiguous patterns'''
+        for name in ('opt', 'opt_grp', 'twice'):
+            self.assertIsNone(get_urls_entry().plans[name])
+            self.assertEqual(fast_reverse(name), reverse(name))
+
+    def test_no_match(self):
+        '''It should raise NoReverseMatch like reverse()'''
+        for args, kwargs in (((), {}), (('abc',), {}), ((1, 2), {}), ((1, None), {}),
+                             ((), {'other': 1}), ((1,), {'test': 1})):
+            with self.assertRaises((NoReverseMatch, ValueError)):
+                fast_reverse('test_arg', *args, **kwargs)
+        with self.assertRaises(NoReverseMatch):
+            fast_reverse('unknown')
+
+    @override_settings(JS_URLS_EXCLUDE=['test_form'])
+    def test_not_serialized(self):
+        '''It should reverse URLs excluded from the mapping'''
+        self.assertEqual(fast_reverse('test_form'), reverse('test_form'))
+
+    def test_script_prefix(self):
+        from django.core.urlresolvers import set_script_prefix, _prefixes
+        try:
+            set_script_prefix('/force_script/')
+            self.assertReversed('test_arg', 41)
+            self.assertEqual(fast_reverse('test_arg', 41), '/force_script/test/arg/41')
+        finally:
+            del _prefixes.value
+
+    def test_package_shortcut(self):
+        '''It should be available from the djangojs package'''
+        import djangojs
+        self.assertEqual(djangojs.fast_reverse('test_arg', 41), reverse('test_arg', args=[41]))
+
+
+DISK_URLCONF = """
+from django.conf.urls import patterns, url, include
+from djangojs_disk_api import api_patterns
+
+urlpatterns = patterns('',
+    url(r'^djangojs/', include('djangojs.urls')),
+    url(r'^disk/(?P<pk>\\d+)$', 'djangojs.test_urls.unnamed', name='disk'),
+    url(r'^api/', include(api_patterns)),
+)
+"""
+
+DISK_API = """
+from django.conf.urls import patterns, url
+
+api_patterns = patterns('',
+    url(r'^one$', 'djangojs.test_urls.unnamed', name='api_one'),
+    %s
+)
+"""
+
+
+class UrlsDiskCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        self.module_file = os.path.join(self.directory, 'djangojs_disk_urls.py')
+        with open(self.module_file, 'w') as module_file:
+            module_file.write(DISK_URLCONF)
+        self.write_api()
+        sys.path.insert(0, self.directory)
+        self.override = override_settings(JS_URLS_CACHE_DIR=self.cache_dir)
+        self.override.enable()
+        clear_urls_cache()
+        self.built = 0
+        self.original_iter_urls = urls_serializer._iter_urls
+
+        def counting_iter_urls(urlconf):
+            self.built += 1
+            return self.original_iter_urls(urlconf)
+        urls_serializer._iter_urls = counting_iter_urls
+
+    def tearDown(self):
+        urls_serializer._iter_urls = self.original_iter_urls
+        self.override.disable()
+        sys.path.remove(self.directory)
+        sys.modules.pop('djangojs_disk_urls', None)
+        sys.modules.pop('djangojs_disk_api', None)
+        shutil.rmtree(self.directory)
+
+    def write_api(self, extra='', mtime=None):
+        filename = os.path.join(self.directory, 'djangojs_disk_api.py')
+        with open(filename, 'w') as module_file:
+            module_file.write(DISK_API % extra)
+        if mtime:
+            os.utime(filename, (mtime, mtime))
+        for name in 'djangojs_disk_urls', 'djangojs_disk_api':  # As in a new process
+            sys.modules.pop(name, None)
+        return filename
+
+    def get_urls(self):
+        clear_urls_cache()  # Only drop the in-memory cache
+        return urls_as_dict('djangojs_disk_urls')
+
+    def test_write_and_load(self):
+        '''It should build the mapping once and then load it from disk'''
+        urls = self.get_urls()
+        self.assertEqual(urls['disk'], '/disk/<pk>')
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        self.assertEqual(self.get_urls(), urls)
+        self.assertEqual(self.built, 1)
+
+    def test_modified_urlconf(self):
+        '''It should rebuild the mapping if an URLconf file changed'''
+        self.get_urls()
+        mtime = os.path.getmtime(self.module_file) + 10
+        os.utime(self.module_file, (mtime, mtime))
+        self.get_urls()
+        self.get_urls()
+        self.assertEqual(self.built, 2)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_modified_included_list(self):
+        '''It should rebuild the mapping if an included patterns list module changed'''
+        filename = self.write_api()
+        mtime = os.path.getmtime(filename)
+        self.assertNotIn('api_two', self.get_urls())
+        self.write_api("url(r'^two$', 'djangojs.test_urls.unnamed', name='api_two'),", mtime=mtime)
+        self.assertEqual(self.get_urls()['api_two'], '/api/two')
+        self.assertEqual(self.built, 2)
+
+    def test_included_list_structure(self):
+        '''It should rebuild the mapping if an included patterns list changed in memory'''
+        from django.conf.urls import url
+        self.get_urls()
+        api_patterns = sys.modules['djangojs_disk_api'].api_patterns
+        api_patterns.append(url(r'^three$', 'djangojs.test_urls.unnamed', name='three'))
+        self.assertEqual(self.get_urls()['three'], '/api/three')
+        self.assertEqual(self.built, 2)
+
+    def test_settings_changed(self):
+        '''It should rebuild the mapping if the serialization settings changed'''
+        self.get_urls()
+        with override_settings(JS_URLS_EXCLUDE=['disk']):
+            self.assertNotIn('disk', self.get_urls())
+        self.assertIn('disk', self.get_urls())
+        self.assertEqual(self.built, 3)
+
+    def test_corrupted(self):
+        '''It should rebuild a corrupted cache file'''
+        urls = self.get_urls()
+        filename = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        with open(filename, 'w') as cache_file:
+            cache_file.write('{"fingerprint":')
+        self.assertEqual(self.get_urls(), urls)
+        self.assertEqual(self.get_urls(), urls)
+        self.assertEqual(self.built, 2)
+
+    def test_not_cacheable(self):
+        '''It should not use the disk for URLconfs without files'''
+        module = types.ModuleType(str('djangojs_memory_urls'))
+        module.urlpatterns = fake_patterns
+        self.assertEqual(urls_as_dict(module), {'fake': '/fake'})
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+
+class PreloadUrlsTest(TestCase):
+    urls = 'djangojs.test_urls'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        clear_urls_cache()
+
+    def tearDown(self):
+        clear_urls_cache()
+        shutil.rmtree(self.directory)
+
+    def test_share(self):
+        '''It should move the payload into a memory-mapped file'''
+        payload = get_urls_entry().payload
+        entries = preload_urls(directory=self.directory)
+        self.assertEqual(len(entries), 1)
+        entry = entries[0]
+        self.assertIs(entry, get_urls_entry())
+        self.assertIsNotNone(entry.shared)
+        self.assertEqual(entry.payload, payload)
+        self.assertEqual(os.listdir(self.directory), ['payload-%s.json' % entry.hash])
+
+    def test_reuse_file(self):
+        '''It should map an existing payload file'''
+        entry = preload_urls(directory=self.directory)[0]
+        clear_urls_cache()
+        self.assertEqual(preload_urls(directory=self.directory)[0].payload, entry.payload)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_no_directory(self):
+        '''It should not preload anything without a directory'''
+        self.assertEqual(preload_urls(), [])
+        self.assertIsNone(get_urls_entry().shared)
+
+    @override_settings(JS_URLS_CACHE_DIR=None)
+    def test_cache_dir(self):
+        '''It should default to settings.JS_URLS_CACHE_DIR'''
+        with override_settings(JS_URLS_CACHE_DIR=self.directory):
+            entry = preload_urls()[0]
+        self.assertIn('payload-%s.json' % entry.hash, os.listdir(self.directory))
+
+    def test_script_prefix(self):
+        '''It should build the mappings for a given script prefix'''
+        entry = preload_urls(directory=self.directory, script_prefix='/prefix/')[0]
+        self.assertEqual(get_script_prefix(), '/')
+        self.assertEqual(entry.urls['test_arg'], '/prefix/test/arg/<>')
+        set_script_prefix('/prefix/')
+        try:
+            self.assertIs(get_urls_entry(), entry)
+        finally:
+            set_script_prefix('/')
+
+    def test_prune(self):
+        '''It should remove the payload files not preloaded for settings.JS_CACHE_DURATION'''
+        expired, recent = [os.path.join(self.directory, 'payload-%s.json' % name) for name in ('old', 'new')]
+        for filename in expired, recent:
+            open(filename, 'w').close()
+        mtime = time.time() - 25 * 3600
+        os.utime(expired, (mtime, mtime))
+        entry = preload_urls(directory=self.directory)[0]
+        expected = ['payload-new.json', 'payload-%s.json' % entry.hash]
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(expected))
+
+    def test_stream_shared_payload(self):
+        '''It should stream the shared payload'''
+        entry = preload_urls(directory=self.directory)[0]
+        response = self.client.get(reverse('django_js_urls'))
+        if getattr(response, 'streaming', False):
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        self.assertEqual(content, entry.payload)
+        self.assertEqual(response['ETag'], '"%s"' % entry.hash)
+
+    def test_init_shared_payload(self):
+        '''It should render the init script from the shared payload'''
+        entry = preload_urls(directory=self.directory)[0]
+        response = self.client.get(reverse('django_js_init'))
+        self.assertIn(entry.payload, response.content)
+
+    @override_settings(LANGUAGES=(('en', 'English'), ('fr', 'French')))
+    def test_localized(self):
+        '''It should preload a payload by language for localized URLconfs'''
+        entries = preload_urls('djangojs.test_urls_i18n', directory=self.directory)
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        with translation.override('fr'):
+            self.assertIs(get_urls_entry('djangojs.test_urls_i18n'), entries[1])
+            self.assertEqual(urls_as_dict('djangojs.test_urls_i18n')['home'], '/fr/home/')
+
+
+class UrlsUsageTest(TestCase):
+    urls = 'djangojs.test_urls'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.directory, 'urls.json')
+        with open(self.manifest, 'w') as manifest:
+            json.dump(['test_form', 'ns2:nested:fake'], manifest)
+        clear_urls_cache()
+
+    def tearDown(self):
+        clear_urls_cache()
+        shutil.rmtree(self.directory)
+
+    def test_used_names_only(self):
+        '''It should only serialize the URLs names used from javascript'''
+        with override_settings(JS_URLS_USAGE=self.manifest):
+            self.assertEqual(sorted(urls_as_dict()), ['ns2:nested:fake', 'test_form'])
+
+    def test_dynamic_names(self):
+        '''It should serialize the dynamic names too'''
+        with override_settings(JS_URLS_USAGE=self.manifest, JS_URLS_DYNAMIC=['ns1:*', 'opt']):
+            self.assertEqual(sorted(urls_as_dict()), ['ns1:fake', 'ns2:nested:fake', 'opt', 'test_form'])
+
+    def test_missing_manifest(self):
+        '''It should serialize every URL if the manifest can't be read'''
+        with override_settings(JS_URLS_USAGE=os.path.join(self.directory, 'missing.json')):
+            self.assertIn('opt', urls_as_dict())
+            self.assertIn('ns1:fake', urls_as_dict())
+
+
+class UrlsStatsTest(TestCase):
+    urls = 'djangojs.test_urls'
+
+    def setUp(self):
+        clear_urls_cache()
+
+    def get_include(self, stats, namespace):
+        return [include for include in stats['includes'] if include['namespace'] == namespace][0]
+
+    def test_totals(self):
+        '''It should report the serialized URLs count and size'''
+        stats = urls_stats()
+        self.assertEqual(stats['patterns'], len(urls_as_dict()))
+        self.assertEqual(stats['bytes'], len(urls_as_json_bytes()))
+        self.assertGreater(stats['time'], 0)
+
+    def test_includes(self):
+        '''It should report each include size and build time'''
+        stats = urls_stats()
+        djangojs = [include for include in stats['includes'] if include['urlconf'] == 'djangojs.urls'][0]
+        self.assertEqual(djangojs['prefix'], '/djangojs/')
+        self.assertEqual(djangojs['patterns'], len([u for u in urls_as_dict().values() if u.startswith('/djangojs/')]))
+        ns2 = self.get_include(stats, 'ns2')
+        nested = self.get_include(stats, 'ns2:nested')
+        self.assertEqual(nested['patterns'], 1)
+        self.assertEqual(nested['bytes'], len('"ns2:nested:fake":"/test/namespace2/nested/fake",'))
+        self.assertEqual(ns2['patterns'], nested['patterns'] + self.get_include(stats, 'ns2:appnested')['patterns'])
+        self.assertGreaterEqual(ns2['time'], nested['time'])
+
+    @override_settings(JS_URLS_EXCLUDE=['opt', 'ns1:fake'], JS_URLS_NAMESPACES_EXCLUDE=['ns2'])
+    def test_filters(self):
+        '''It should count the names and namespaces rejected by each filter'''
+        filters = urls_stats()['filters']
+        self.assertEqual(filters['JS_URLS_EXCLUDE'], 2)
+        self.assertEqual(filters['JS_URLS_NAMESPACES_EXCLUDE'], 1)
+        self.assertEqual(filters['JS_URLS'], 0)
+
+    def test_view_debug_only(self):
+        '''It should only serve the diagnostics in DEBUG mode'''
+        with override_settings(DEBUG=False):
+            self.assertEqual(self.client.get(reverse('django_js_urls_stats')).status_code, 404)
+        with override_settings(DEBUG=True):
+            response = self.client.get(reverse('django_js_urls_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['patterns'], len(urls_as_dict()))
+
+
+class NamesFilterTest(TestCase):
+    def test_empty(self):
+        '''An empty filter should be falsy'''
+        self.assertFalse(NamesFilter())
+        self.assertFalse(NamesFilter([]))
+        self.assertTrue(NamesFilter(['name']))
+        self.assertTrue(NamesFilter(['name*']))
+
+    def test_contains(self):
+        '''It should match exact names and glob-style patterns'''
+        names_filter = NamesFilter(['exact', 'api:*', 'admin:*_changelist'])
+        for name in 'exact', 'api:users', 'api:v2:users', 'admin:auth_user_changelist':
+            self.assertIn(name, names_filter)
+        for name in 'exac', 'api', 'other:exact', 'admin:auth_user_add':
+            self.assertNotIn(name, names_filter)
+
+    def test_may_contain(self):
+        '''It should know which namespaces may contain matching names'''
+        names_filter = NamesFilter(['app:sub:name', 'api:v*:list'])
+        for namespace in 'app', 'app:sub', 'api', 'api:v2', 'api:v2:nested':
+            self.assertTrue(names_filter.may_contain(namespace))
+        for namespace in 'other', 'app:other', 'app:sub:name', 'api:other':
+            self.assertFalse(names_filter.may_contain(namespace))
+
+    def test_may_contain_unqualified(self):
+        '''Any namespace may contain unqualified names'''
+        for names in ['app:name', 'name'], ['app:name', 'na*']:
+            self.assertTrue(NamesFilter(names).may_contain('other'))
+
+
+class UrlTemplateCompilerTest(TestCase):
+    def assertTemplate(self, regex, expected):
+        self.assertEqual(_compile_template(regex), expected)
+
+    def test_nested_groups(self):
+        '''It should ignore groups nested into a parameter'''
+        self.assertTemplate(r'^(?P<pk>\d+(?:,(\d+))*)/$', '<pk>/')
+
+    def test_character_set(self):
+        '''It should not count parenthesis in character sets'''
+        self.assertTemplate(r'^(?P<char>[()])/(\w+)$', '<char>/<>')
+
+    def test_mandatory_non_capturing_group(self):
+        '''It should keep mandatory non capturing groups content'''
+        self.assertTemplate(r'^(?:prefix/)(?P<slug>[-\w]+)/(?:suffix)?$', 'prefix/<slug>/')
+
+    def test_optionnal_quantifiers(self):
+        '''It should remove any optionnal quantified part'''
+        self.assertTemplate(r'^items?/x{0,3}(?:/page)*(\d+)?$', 'item/')
+
+    def test_unsupported(self):
+        '''It should fallback on substitutions for unsupported constructs'''
+        self.assertTemplate(r'^a+/b|c$', 'a+/b|c')
+
+    def test_cached(self):
+        '''It should compile a given regex only once'''
+        regex = r'^cached/(?P<pk>\d+)$'
+        self.assertIs(_compile_template(regex), _compile_template(regex))
+
+
+class CallbackNameTest(TestCase):
+    def setUp(self):
+        clear_urls_cache()
+
+    def test_function(self):
+        '''It should give the dotted name of a function view'''
+        self.assertEqual(_get_callback_name(unnamed), 'djangojs.test_urls.unnamed')
+
+    def test_class_based_view(self):
+        '''It should log and give None for a class based view'''
+        records = []
+        handler = logging.Handler(logging.DEBUG)
+        handler.emit = records.append
+        logger = logging.getLogger('djangojs.urls_serializer')
+        level = logger.level
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        try:
+            view = TestFormView.as_view()
+            self.assertIsNone(_get_callback_name(view))
+            self.assertIsNone(_get_callback_name(view))
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+        self.assertEqual(len(records), 1)  # Resolved only once
+
+
+class UrlsCacheTest(TestCase):
+    urls = 'djangojs.test_urls'
+
+    def setUp(self):
+        clear_urls_cache()
+
+    def test_shared_mapping(self):
+        '''It should build the mapping once and share it'''
+        self.assertIs(urls_as_dict(), urls_as_dict())
+
+    def test_read_only(self):
+        '''It should not allow shared mapping modifications'''
+        result = urls_as_dict()
+        with self.assertRaises(TypeError):
+            result['new'] = '/new'
+        with self.assertRaises(TypeError):
+            del result['django_js_urls']
+        with self.assertRaises(TypeError):
+            result.update({'new': '/new'})
+
+    def test_clear_urls_cache(self):
+        '''It should rebuild the mapping after clear_urls_cache()'''
+        result = urls_as_dict()
+        clear_urls_cache()
+        self.assertIsNot(urls_as_dict(), result)
+        self.assertEqual(urls_as_dict(), result)
+
+    def test_clear_url_caches(self):
+        '''It should rebuild the mapping from reloaded URLconfs after Django clear_url_caches()'''
+        from django.conf.urls import url
+        urlconf = sys.modules[self.urls]
+        result = urls_as_dict()
+        self.assertNotIn('reloaded', result)
+        urlconf.urlpatterns.append(url(r'^reloaded$', unnamed, name='reloaded'))
+        try:
+            clear_url_caches()
+            self.assertIsNot(urls_as_dict(), result)
+            self.assertEqual(urls_as_dict()['reloaded'], reverse('reloaded'))
+            self.assertIn('reloaded', dict(iter_urls()))
+        finally:
+            urlconf.urlpatterns.pop()
+            clear_url_caches()
+
+    def test_included_urlconf_compiled_once(self):
+        '''It should compile an URLconf once whatever the number of inclusions'''
+        compiled = []
+        compile_patterns = urls_serializer._compile_patterns
+
+        def counting_compile_patterns(patterns):
+            compiled.append(patterns)
+            return compile_patterns(patterns)
+
+        urls_serializer._compile_patterns = counting_compile_patterns
+        try:
+            result = urls_as_dict()
+        finally:
+            urls_serializer._compile_patterns = compile_patterns
+        # Included as ns1, app1, ns2:nested, ns2:appnested, app2:nested, app2:appnested and ns3
+        self.assertEqual(len([name for name in result if name.endswith(':fake')]), 7)
+        self.assertEqual(len([patterns for patterns in compiled if patterns is fake_patterns]), 1)
+
+    def test_setting_changed(self):
+        '''It should rebuild the mapping when settings change'''
+        result = urls_as_dict()
+        with self.settings(JS_URLS=['django_js_urls']):
+            self.assertEqual(list(urls_as_dict().keys()), ['django_js_urls'])
+        self.assertIsNot(urls_as_dict(), result)
+        self.assertEqual(urls_as_dict(), result)
+
+    def test_json_bytes(self):
+        '''It should serialize the mapping once as sorted JSON bytes'''
+        payload = urls_as_json_bytes()
+        self.assertIsInstance(payload, bytes)
+        self.assertIs(urls_as_json_bytes(), payload)
+        self.assertEqual(json.loads(payload.decode()), urls_as_dict())
+        self.assertEqual(urls_as_json(), payload.decode())
+        keys = list(json.loads(payload.decode(), object_pairs_hook=lambda pairs: [k for k, _ in pairs]))
+        self.assertEqual(keys, sorted(keys))
+
+    def test_hash(self):
+        '''It should provide a stable content hash'''
+        digest = urls_hash()
+        self.assertEqual(digest, hashlib.sha256(urls_as_json_bytes()).hexdigest())
+        clear_urls_cache()
+        self.assertEqual(urls_hash(), digest)
+        with self.settings(JS_URLS_EXCLUDE=['django_js_urls']):
+            self.assertNotEqual(urls_hash(), digest)
+
+
+class UrlconfTest(TestCase):
+    urls = 'djangojs.test_urls'
+    tenant = 'djangojs.test_urls_tenant'
+
+    def setUp(self):
+        clear_urls_cache()
+        cache.clear()  # Views responses
+
+    def test_explicit_urlconf(self):
+        '''It should serialize a given URLconf'''
+        result = urls_as_dict(self.tenant)
+        self.assertEqual(result['tenant'], '/tenant/<slug>/')
+        self.assertEqual(result['django_js_urls'], '/djangojs/urls')
+        self.assertNotIn('test_arg', result)
+        self.assertNotIn('tenant', urls_as_dict())
+
+    def test_active_urlconf(self):
+        '''It should serialize the URLconf active for the current thread'''
+        set_urlconf(self.tenant)
+        try:
+            result = urls_as_dict()
+        finally:
+            set_urlconf(None)
+        self.assertIn('tenant', result)
+
+    def test_request_urlconf(self):
+        '''Views should serialize the request URLconf'''
+        request = RequestFactory().get('/djangojs/urls')
+        request.urlconf = self.tenant
+        response = UrlsJsonView.as_view()(request)
+        self.assertIn('tenant', json.loads(response.content.decode()))
+
+        request = RequestFactory().get('/djangojs/init.js')
+        request.urlconf = self.tenant
+        request.user = AnonymousUser()
+        context = JsInitView(request=request).get_context_data()
+        self.assertIn('tenant', json.loads(context['urls']))
+
+    def test_cached_views(self):
+        '''Cached views should serve each request URLconf its own mapping'''
+        for view, path in ((UrlsJsonView, '/djangojs/urls'), (JsInitView, '/djangojs/init.js')):
+            for urlconf in None, self.tenant, None:
+                request = RequestFactory().get(path)
+                request.user = AnonymousUser()
+                if urlconf:
+                    request.urlconf = urlconf
+                response = view.as_view()(request)
+                if hasattr(response, 'render'):
+                    response.render()
+                content = response.content.decode()
+                if urlconf:
+                    self.assertIn('/tenant/', content)
+                else:
+                    self.assertNotIn('/tenant/', content)
+
+    @override_settings(JS_URLS_CACHE_SIZE=2)
+    def test_cache_size(self):
+        '''It should only keep the most recently used mappings'''
+        root = get_urls_entry()
+        tenant = get_urls_entry(self.tenant)
+        self.assertIs(get_urls_entry(), root)
+        get_urls_entry('djangojs.urls')
+        self.assertIs(get_urls_entry(), root)
+        self.assertIsNot(get_urls_entry(self.tenant), tenant)
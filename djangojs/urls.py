@@ -6,7 +6,7 @@ from os.path import join, isdir
 from django.conf.urls import patterns, url
 
 from djangojs.conf import settings
-from djangojs.views import UrlsJsonView, ContextJsonView, JsInitView
+from djangojs.views import UrlsJsonView, UrlsStatsView, ContextJsonView, PermissionsJsonView, JsInitView
 
 
 def js_info_dict():
@@ -32,6 +32,9 @@ def js_info_dict():
 urlpatterns = patterns('',
     url(r'^init\.js$', JsInitView.as_view(), name='django_js_init'),
     url(r'^urls$', UrlsJsonView.as_view(), name='django_js_urls'),
+    url(r'^urls/(?P<namespace>[^/:]+)$', UrlsJsonView.as_view(), name='django_js_urls_shard'),
+    url(r'^urls-stats$', UrlsStatsView.as_view(), name='django_js_urls_stats'),
     url(r'^context$', ContextJsonView.as_view(), name='django_js_context'),
+    url(r'^permissions$', PermissionsJsonView.as_view(), name='django_js_permissions'),
     url(r'^translation$', 'django.views.i18n.javascript_catalog', js_info_dict(), name='js_catalog'),
 )
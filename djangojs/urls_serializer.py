@@ -1,24 +1,57 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import hashlib
 import json
 import logging
+import mmap
+import os
 import re
 import sys
+import tempfile
+import threading
+import time
 import types
 
+from json.encoder import encode_basestring_ascii
+
+try:
+    from collections import OrderedDict
+except ImportError:  # Python 2.6
+    from django.utils.datastructures import SortedDict as OrderedDict
+
 from django.core.serializers.json import DjangoJSONEncoder
-from django.core.urlresolvers import RegexURLPattern, RegexURLResolver, get_script_prefix
-from django.utils import six
+from django.core.urlresolvers import RegexURLPattern, RegexURLResolver, LocaleRegexURLResolver
+from django.core.urlresolvers import get_resolver, get_script_prefix, get_urlconf, reverse, set_script_prefix
+from django.dispatch import receiver
+from django.utils import six, translation
+from django.utils.encoding import force_bytes, force_text, iri_to_uri
+from django.utils.functional import Promise
+from django.utils.http import urlquote
 
-from djangojs.conf import settings
+from djangojs.conf import get_config
+from djangojs.utils import ImmutableDict, NamesFilter
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.8
+    from django.test.signals import setting_changed
 
 logger = logging.getLogger(__name__)
 
 
 __all__ = (
+    'iter_urls',
+    'iter_urls_json',
     'urls_as_dict',
     'urls_as_json',
+    'urls_as_json_bytes',
+    'urls_hash',
+    'urls_as_compact_json',
+    'fast_reverse',
+    'preload_urls',
+    'urls_stats',
+    'clear_urls_cache',
 )
 
 RE_KWARG = re.compile(r"(\(\?P\<(.*?)\>.*?\))")  # Pattern for recongnizing named parameters in urls
@@ -28,6 +61,55 @@ RE_OPT_GRP = re.compile(r"\(\?\:.*\)(?:\?|\*)")  # Pattern for recognizing optio
 RE_ESCAPE = re.compile(r'([^\\]?)\\')  # Recognize escape characters
 RE_START_END = re.compile(r'[\$\^]')  # Recognize start and end charaters
 
+RE_SEGMENT = re.compile(r'[^/]*/')  # An URL path segment with its trailing slash
+RE_URL_SAFE = re.compile(r'[A-Za-z0-9_.\-/]*\Z')  # Characters never quoted by urlquote()
+
+# Tokenizer used to compile an URL regex into a template in a single pass
+RE_TOKEN = re.compile(r'''
+    (?P<literal>[^\\\[\](){}?*+^$|.]+)                  # a run of literal characters
+    |\\(?P<escaped>.)                                   # an escaped character
+    |\(\?P<(?P<name>\w+)>                               # a named group
+    |(?P<group>\(\?:|\((?!\?))                          # a non capturing or an anonymous group
+    |(?P<extension>\(\?)                                # any other group extension
+    |(?P<close>\))                                      # a group end
+    |(?P<optional>(?:[?*]|\{0(?:,\d*)?\}|\{,\d*\})\??)  # an optionnal quantifier
+    |(?P<anchor>[\^$])                                  # a start or end anchor
+    |(?P<set>\[\^?\]?(?:\\.|[^\]])*\])                  # a character set
+    |(?P<other>.)                                       # anything else
+''', re.VERBOSE | re.DOTALL | re.UNICODE)
+
+#: Marker for exhausted positional arguments
+_MISSING = object()
+
+#: Compiled URL templates keyed by regex source
+_TEMPLATES = {}
+
+#: Compiled reverse substitution parts keyed by regex source
+_PLANS = {}
+
+#: Unnamed URLs callbacks dotted names
+_CALLBACK_NAMES = {}
+
+#: Loaded URLs usage manifest filter (see ``settings.JS_URLS_USAGE``)
+_USAGE = {}
+
+#: Compiled URLconfs nodes keyed by module name or id
+_URLCONFS = {}
+
+#: Whether URLconfs depend on the active language, keyed by module name or id
+_LOCALIZED = {}
+
+#: Compiled django-cms apphooks nodes keyed by resolver id
+_APPHOOKS = {}
+
+#: Django resolvers the compiled nodes have been built for, keyed by URLconf
+_RESOLVERS = {}
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+# Compiled URLconfs nodes kinds
+URL, TRANSLATED, INCLUDE, APPHOOK = 'url', 'translated', 'include', 'apphook'
+
 try:  # check for django-cms
     from cms.appresolver import AppRegexURLResolver
     CMS_APP_RESOLVER = True
@@ -35,115 +117,1043 @@ except:
     CMS_APP_RESOLVER = False  # we can live without it
 
 
-def urls_as_dict():
+class UrlsCacheEntry(object):
+    '''
+    A built URLs mapping with its canonical JSON serialization.
+
+    The payload is encoded once with sorted keys so identical mappings
+    always give identical bytes and thus the same hash.
+    '''
+    def __init__(self, urls, resolver=None, source=None):
+        #: The resolver the mapping has been built from
+        self.resolver = resolver
+        #: The ``(urlconf, script prefix, language)`` the mapping has been built from
+        self.source = source
+        #: The read-only URLs mapping
+        self.urls = ImmutableDict(urls)
+        self._payload = force_bytes(json.dumps(
+            self.encode(self.urls), cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':')
+        ))
+        #: The payload SHA-256 hexadecimal digest
+        self.hash = hashlib.sha256(self._payload).hexdigest()
+        #: The payload memory-mapped file if shared (see :meth:`share`)
+        self.shared = None
+        self._shards = None
+        self._compact = None
+        self._plans = None
+
+    def encode(self, urls):
+        '''
+        Get the JSON serializable form of the mapping.
+        '''
+        return urls
+
+    @property
+    def payload(self):
+        '''
+        The JSON serialized mapping as bytes.
+        '''
+        return self._payload if self.shared is None else self.shared[:]
+
+    def share(self, directory):
+        '''
+        Move the payload into a memory-mapped file of ``directory``
+        so processes forked afterward share the same memory pages.
+        '''
+        if self.shared is not None:
+            return
+        filename = os.path.join(directory, 'payload-%s.json' % self.hash)
+        if os.path.exists(filename):
+            os.utime(filename, None)  # Keep it from being pruned
+        else:
+            _write_file(filename, self._payload)
+        with open(filename, 'rb') as payload_file:
+            self.shared = mmap.mmap(payload_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._payload = None
+
+    @property
+    def compact(self):
+        '''
+        The same mapping as a :class:`CompactUrlsCacheEntry`.
+        '''
+        if self._compact is None:
+            self._compact = CompactUrlsCacheEntry(self.urls, self.resolver)
+        return self._compact
+
+    @property
+    def plans(self):
+        '''
+        The :class:`ReversePlan` of each URL name, ``None`` for those which can't be reversed by substitution.
+        '''
+        if self._plans is None:
+            self._plans = _build_plans(*self.source) if self.source else {}
+        return self._plans
+
+    @property
+    def shards(self):
+        '''
+        The mapping split by top-level namespace into entries of the same kind,
+        non-namespaced URLs being keyed by an empty string.
+        '''
+        if self._shards is None:
+            groups = {'': {}}
+            for name, template in self.urls.items():
+                namespace = name.split(':', 1)[0] if ':' in name else ''
+                groups.setdefault(namespace, {})[name] = template
+            self._shards = ImmutableDict((namespace, self.__class__(urls)) for namespace, urls in groups.items())
+        return self._shards
+
+    def shards_payload(self, namespaces):
+        '''
+        Get the JSON payload of the given namespaces shards merged as bytes.
+        '''
+        parts = [self.shards[ns].payload[1:-1] for ns in namespaces if ns in self.shards]
+        return b''.join((b'{', b','.join(part for part in parts if part), b'}'))
+
+
+class ReversePlan(object):
+    '''
+    A precompiled URL substitution plan made of literal strings and ``(name, group regex)`` parameters.
+    '''
+    __slots__ = ('parts', 'names')
+
+    def __init__(self, parts):
+        # Literals are made URI safe once, parameters are quoted on substitution
+        self.parts = tuple(iri_to_uri(part) if isinstance(part, six.string_types) else part for part in parts)
+        names = [part[0] for part in parts if not isinstance(part, six.string_types)]
+        #: The parameters names if all named
+        self.names = frozenset(names) if all(names) else None
+
+    def reverse(self, args, kwargs):
+        '''
+        Substitute the arguments like ``reverse()`` does.
+
+        Return ``None`` if the arguments don't match the parameters.
+        '''
+        if args and kwargs:
+            return None
+        if kwargs and (self.names is None or len(kwargs) != len(self.names) or
+                       any(k not in kwargs for k in self.names)):
+            return None
+        args = iter(args)
+        url = []
+        for part in self.parts:
+            if isinstance(part, six.string_types):
+                url.append(part)
+                continue
+            name, regex = part
+            try:
+                value = kwargs[name] if kwargs else next(args)
+            except StopIteration:
+                return None
+            if not isinstance(value, six.text_type):
+                value = force_text(value)
+            if not regex.match(value):
+                return None
+            url.append(value if RE_URL_SAFE.match(value) else urlquote(value))
+        if next(args, _MISSING) is not _MISSING:
+            return None
+        url = ''.join(url)
+        if url.startswith('//'):  # Don't allow construction of scheme relative urls
+            url = '/%%2F%s' % url[2:]
+        return url
+
+
+class CompactUrlsCacheEntry(UrlsCacheEntry):
+    '''
+    A built URLs mapping serialized with shared prefixes.
+
+    The payload is a ``[prefixes, urls]`` JSON array where:
+
+    - ``prefixes`` is a flat list of ``parent, segment`` pairs,
+      a prefix being its parent prefix (``-1`` for none) followed by its segment.
+    - ``urls`` is a flat list of ``name, prefix, remainder`` triples.
+
+    Parents are always listed before their children so it can be expanded in a single pass.
+    '''
+    def encode(self, urls):
+        root = ({}, [])
+        for name in sorted(urls):
+            template = urls[name]
+            node, start = root, 0
+            for match in RE_SEGMENT.finditer(template):
+                node = node[0].setdefault(match.group(), ({}, []))
+                start = match.end()
+            node[1].append((name, template[start:]))
+
+        prefixes, entries = [], []
+        stack = [(root, -1, '')]
+        while stack:
+            (children, names), index, pending = stack.pop()
+            # Only prefixes shared by at least two URLs or sub-prefixes are worth a reference
+            if pending and len(children) + len(names) > 1:
+                prefixes.extend((index, pending))
+                index, pending = len(prefixes) // 2 - 1, ''
+            for name, remainder in names:
+                entries.extend((name, index, pending + remainder))
+            for segment in sorted(children, reverse=True):
+                stack.append((children[segment], index, pending + segment))
+        return [prefixes, entries]
+
+    @property
+    def compact(self):
+        return self
+
+
+#: Built URLs mappings keyed by ``(urlconf, script prefix, language)``, least recently used first.
+#: Django memoizes resolvers until ``clear_url_caches()`` is called
+#: so a resolver mismatch means a stale entry.
+_URLS_CACHE = OrderedDict()
+_URLS_CACHE_LOCK = threading.Lock()
+
+_EMPTY_ENTRY = UrlsCacheEntry({})
+
+
+def get_urls_entry(urlconf=None):
+    '''
+    Get the cached :class:`UrlsCacheEntry` for an URLconf, building it if needed.
+
+    Default to the URLconf of the current request if any (``request.urlconf``)
+    or to ``settings.ROOT_URLCONF``.
+    URLconfs depending on the active language (``i18n_patterns()`` or translated regexes)
+    have an entry by language of ``settings.LANGUAGES``.
+    At most ``settings.JS_URLS_CACHE_SIZE`` entries are kept, least recently used are dropped first.
+    '''
+    config = get_config()
+    if not config.JS_URLS_ENABLED:
+        return _EMPTY_ENTRY
+    urlconf = urlconf or get_urlconf() or config.ROOT_URLCONF
+    resolver = _get_resolver(urlconf)
+    language = _get_language() if _is_localized(urlconf) else None
+    key = (urlconf, get_script_prefix(), language)
+    with _URLS_CACHE_LOCK:
+        entry = _URLS_CACHE.pop(key, None)
+        if entry is not None and entry.resolver is resolver:
+            _URLS_CACHE[key] = entry  # Most recently used is last
+            return entry
+    if language:
+        with translation.override(language):
+            urls = _build_urls(urlconf, key[1], language)
+    else:
+        urls = _build_urls(urlconf, key[1], language)
+    entry = UrlsCacheEntry(urls, resolver, key)
+    with _URLS_CACHE_LOCK:
+        _URLS_CACHE[key] = entry
+        while len(_URLS_CACHE) > max(config.JS_URLS_CACHE_SIZE, 1):
+            del _URLS_CACHE[next(iter(_URLS_CACHE))]
+    return entry
+
+
+def iter_urls(urlconf=None):
+    '''
+    Iterate over the URLs as ``(name, template)`` tuples while walking the URLconf depth-first.
+
+    Unlike :func:`urls_as_dict`, nothing is cached nor kept in memory.
+    A name can be yielded more than once, the last one has priority.
+    '''
+    if not get_config().JS_URLS_ENABLED:
+        return iter(())
+    urlconf = _get_urlconf(urlconf)
+    _get_resolver(urlconf)
+    return _iter_urls(urlconf)
+
+
+def iter_urls_json(urlconf=None):
+    '''
+    Serialize the URLs as JSON chunks while walking the URLconf (see :func:`iter_urls`).
+
+    Chunks can be streamed into a response or a file::
+
+        output.writelines(iter_urls_json())
+
+    Duplicated names are serialized in order so JSON parsers keep the last one,
+    like :func:`urls_as_dict` does.
     '''
-    Get the URLs mapping as a dictionnary
+    yield '{'
+    separator = ''
+    for name, template in iter_urls(urlconf):
+        yield '%s%s:%s' % (separator, encode_basestring_ascii(name), encode_basestring_ascii(template))
+        separator = ','
+    yield '}'
+
+
+def urls_as_dict(urlconf=None):
+    '''
+    Get the URLs mapping as a dictionnary.
+
+    The mapping is built once per URLconf and shared as a read-only dictionnary
+    until :func:`clear_urls_cache` or Django's ``clear_url_caches()`` is called.
     '''
-    module = settings.ROOT_URLCONF
-    return _get_urls(module) if settings.JS_URLS_ENABLED else {}
+    return get_urls_entry(urlconf).urls
 
 
-def urls_as_json():
+def urls_as_json(urlconf=None):
     '''
     Get the URLs mapping as JSON
     '''
-    return json.dumps(urls_as_dict(), cls=DjangoJSONEncoder)
+    return get_urls_entry(urlconf).payload.decode('ascii')
 
 
-def _get_urls_for_pattern(pattern, prefix='', namespace=None):
-    urls = {}
+def urls_as_json_bytes(urlconf=None):
+    '''
+    Get the URLs mapping as JSON encoded bytes, without any re-encoding.
+    '''
+    return get_urls_entry(urlconf).payload
 
-    if prefix is '':
-        prefix = get_script_prefix()
 
-    if issubclass(pattern.__class__, RegexURLPattern):
-        if settings.JS_URLS_UNNAMED:
-            mod_name, obj_name = pattern.callback.__module__, pattern.callback.__name__
-            try:
-                module = __import__(mod_name, fromlist=[obj_name])
-                obj = getattr(module, obj_name)
-                func_name = "{0}.{1}".format(mod_name, obj_name) if isinstance(obj, types.FunctionType) else None
-                pattern_name = pattern.name or func_name
-            except:
-                pattern_name = pattern.name
-        else:
-            pattern_name = pattern.name
-
-        if pattern_name:
-            if settings.JS_URLS and pattern_name not in settings.JS_URLS:
-                return {}
-            if settings.JS_URLS_EXCLUDE and pattern_name in settings.JS_URLS_EXCLUDE:
-                return {}
-            if namespace:
-                pattern_name = ':'.join((namespace, pattern_name))
-            full_url = prefix + pattern.regex.pattern
-            for char in ['^', '$']:
-                full_url = full_url.replace(char, '')
-            # remove optionnal non capturing groups
-            opt_grp_matches = RE_OPT_GRP.findall(full_url)
-            if opt_grp_matches:
-                for match in opt_grp_matches:
-                    full_url = full_url.replace(match, '')
-            # remove optionnal characters
-            opt_matches = RE_OPT.findall(full_url)
-            if opt_matches:
-                for match in opt_matches:
-                    full_url = full_url.replace(match, '')
-            # handle kwargs, args
-            kwarg_matches = RE_KWARG.findall(full_url)
-            if kwarg_matches:
-                for el in kwarg_matches:
-                    # prepare the output for JS resolver
-                    full_url = full_url.replace(el[0], "<%s>" % el[1])
-            # after processing all kwargs try args
-            args_matches = RE_ARG.findall(full_url)
-            if args_matches:
-                for el in args_matches:
-                    full_url = full_url.replace(el, "<>")  # replace by a empty parameter name
-            # Unescape charaters
-            full_url = RE_ESCAPE.sub(r'\1', full_url)
-            urls[pattern_name] = full_url
-    elif (CMS_APP_RESOLVER) and (issubclass(pattern.__class__, AppRegexURLResolver)):  # hack for django-cms
-        for p in pattern.url_patterns:
-            urls.update(_get_urls_for_pattern(p, prefix=prefix, namespace=namespace))
-    elif issubclass(pattern.__class__, RegexURLResolver):
-        if pattern.urlconf_name:
-            if pattern.namespace and not pattern.app_name:
-                # Namespace without app_name
-                nss = [pattern.namespace]
+def urls_hash(urlconf=None):
+    '''
+    Get the URLs mapping SHA-256 hexadecimal digest.
+
+    It only changes when the serialized mapping changes
+    so it can be used as a version identifier.
+    '''
+    return get_urls_entry(urlconf).hash
+
+
+def urls_as_compact_json(urlconf=None):
+    '''
+    Get the URLs mapping serialized with shared prefixes
+    (see :class:`CompactUrlsCacheEntry` for the format).
+    '''
+    return get_urls_entry(urlconf).compact.payload.decode('ascii')
+
+
+def fast_reverse(name, *args, **kwargs):
+    '''
+    Reverse an URL by name using the cached URLs templates.
+
+    Behave like ``reverse(name, args=args, kwargs=kwargs)`` but fall back on it
+    for URLs not serialized, with optionnal parts or ambiguous (same name with many patterns).
+    '''
+    plan = get_urls_entry().plans.get(name)
+    if plan is not None:
+        url = plan.reverse(args, kwargs)
+        if url is not None:
+            return url
+    return reverse(name, args=args, kwargs=kwargs)
+
+
+def preload_urls(urlconf=None, directory=None, script_prefix=None):
+    '''
+    Build the URLs mappings and share their payload through memory-mapped files.
+
+    Call it in a server master process before workers are forked
+    (e.g. a gunicorn ``when_ready`` hook or a WSGI module loaded with ``preload_app``)
+    so workers serve the same payload instead of building their own copy.
+    Localized URLconfs are built for each language of ``settings.LANGUAGES``.
+
+    Files are written into ``directory``, default to ``settings.JS_URLS_CACHE_DIR``.
+    Nothing is preloaded if none is given.
+    Mappings are built for ``script_prefix``, default to ``settings.FORCE_SCRIPT_NAME`` or ``/``.
+    Payload files not preloaded for ``settings.JS_CACHE_DURATION`` are removed.
+    '''
+    config = get_config()
+    directory = directory or config.JS_URLS_CACHE_DIR
+    if not config.JS_URLS_ENABLED or not directory:
+        return []
+    urlconf = _get_urlconf(urlconf)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    entries = []
+    previous_prefix = get_script_prefix()
+    set_script_prefix(script_prefix or config.FORCE_SCRIPT_NAME or '/')
+    try:
+        for language in config.languages if _is_localized(urlconf) else [None]:
+            if language:
+                with translation.override(language):
+                    entry = get_urls_entry(urlconf)
             else:
-                # Add urls twice: for app and instance namespace
-                nss = set((pattern.namespace, pattern.app_name))
-            for ns in nss:
-                namespaces = [nsp for nsp in (namespace, ns) if nsp]
-                namespaces = ':'.join(namespaces)
-                if settings.JS_URLS_NAMESPACES and namespaces and namespaces not in settings.JS_URLS_NAMESPACES:
-                    continue
-                if settings.JS_URLS_NAMESPACES_EXCLUDE and namespaces in settings.JS_URLS_NAMESPACES_EXCLUDE:
-                    continue
-                new_prefix = '%s%s' % (prefix, pattern.regex.pattern)
-                urls.update(_get_urls(pattern.urlconf_name, new_prefix, namespaces))
+                entry = get_urls_entry(urlconf)
+            entry.share(directory)
+            entries.append(entry)
+    finally:
+        set_script_prefix(previous_prefix)
+    _prune_payloads(directory)
+    return entries
+
+
+def _prune_payloads(directory):
+    '''
+    Remove the payload files of ``directory`` not preloaded for ``settings.JS_CACHE_DURATION``.
+
+    Workers still mapping a removed file keep their pages.
+    '''
+    expires = time.time() - get_config().JS_CACHE_DURATION * 60
+    for name in os.listdir(directory):
+        if not (name.startswith('payload-') and name.endswith('.json')):
+            continue
+        filename = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(filename) < expires:
+                os.remove(filename)
+        except OSError:
+            pass  # Already removed by another process
+
+
+def urls_stats(urlconf=None):
+    '''
+    Build the URLs mapping from scratch and report where its size and build time come from.
+
+    Return a dictionnary with:
+
+    - ``patterns``, ``bytes`` and ``time``: the serialized URLs count, the JSON payload size
+      and the build time in seconds.
+    - ``includes``: for each included URLconf and namespace, its ``urlconf`` name, ``namespace``,
+      URL ``prefix``, serialized ``patterns`` count, ``bytes`` and build ``time``
+      (nested includes are counted into their parents).
+    - ``filters``: the number of names (or namespaces for namespaces filters)
+      rejected by each ``JS_URLS*`` filter setting.
+
+    Compiled patterns are dropped first (see :func:`clear_urls_cache`) to time a cold build.
+    '''
+    clear_urls_cache()
+    stats = {
+        'includes': [],
+        'filters': dict.fromkeys((
+            'JS_URLS', 'JS_URLS_EXCLUDE', 'JS_URLS_NAMESPACES', 'JS_URLS_NAMESPACES_EXCLUDE', 'JS_URLS_USAGE'
+        ), 0),
+    }
+    if not get_config().JS_URLS_ENABLED:
+        return dict(stats, patterns=0, bytes=2, time=0)
+    start = _timer()
+    urls = dict(_expand(_compile_urlconf(_get_urlconf(urlconf)), get_script_prefix(), None, stats=stats))
+    stats['time'] = _timer() - start
+    stats['patterns'] = len(urls)
+    stats['bytes'] = len(json.dumps(urls, sort_keys=True, separators=(',', ':')))
+    return stats
+
+
+def clear_urls_cache():
+    '''
+    Drop every cached URLs mapping, forcing a rebuild on next access.
+    '''
+    with _URLS_CACHE_LOCK:
+        _URLS_CACHE.clear()
+    _TEMPLATES.clear()
+    _PLANS.clear()
+    _CALLBACK_NAMES.clear()
+    _USAGE.clear()
+    _clear_compiled()
+
+
+@receiver(setting_changed)
+def _on_setting_changed(**kwargs):
+    clear_urls_cache()
+
+
+def _on_cms_change(**kwargs):
+    '''
+    Drop the mappings and the compiled nodes when django-cms pages or apphooks change:
+    URLconfs nodes hold the apphooks resolvers.
+    '''
+    with _URLS_CACHE_LOCK:
+        _URLS_CACHE.clear()
+    _clear_compiled()
+
+
+if CMS_APP_RESOLVER:
+    from cms import signals as cms_signals
+    for signal_name in ('urls_need_reloading', 'post_publish', 'post_unpublish'):
+        signal = getattr(cms_signals, signal_name, None)  # Depends on django-cms version
+        if signal is not None:
+            signal.connect(_on_cms_change, dispatch_uid='djangojs.urls_serializer.{0}'.format(signal_name))
+
+
+class _UnsupportedRegex(Exception):
+    '''Raised when a regex can't be compiled into a template in a single pass'''
+
+
+def _compile_template(regex):
+    '''
+    Compile a Django URL regex into a JS template.
+
+    Named groups are replaced by ``<name>``, anonymous groups by ``<>``
+    and optionnal parts are removed. Results are cached by regex source.
+    '''
+    try:
+        return _TEMPLATES[regex]
+    except KeyError:
+        pass
+    try:
+        parts, _ = _compile_tokens(regex)
+        template = ''.join(part if isinstance(part, six.string_types) else '<%s>' % part[0] for part in parts)
+    except _UnsupportedRegex:
+        template = _compile_template_fallback(regex)
+    _TEMPLATES[regex] = template
+    return template
+
 
+def _compile_plan(regex):
+    '''
+    Compile a Django URL regex into reverse substitution parts:
+    literal strings and ``(name, group regex)`` parameters.
+
+    Regexes with optionnal parts or unsupported constructs can't be reversed by substitution,
+    their parts are ``(None,)``. Results are cached by regex source.
+    '''
+    try:
+        return _PLANS[regex]
+    except KeyError:
+        pass
+    try:
+        parts, exact = _compile_tokens(regex)
+    except _UnsupportedRegex:
+        parts, exact = None, False
+    if exact:
+        plan = tuple(
+            part if isinstance(part, six.string_types) else (part[0], re.compile(r'(?:%s)\Z' % part[1], re.UNICODE))
+            for part in parts if part
+        )
+    else:
+        plan = (None,)
+    _PLANS[regex] = plan
+    return plan
+
+
+def _compile_tokens(regex):
+    '''
+    Tokenize a regex into literal strings and ``(name, group regex)`` capturing groups.
+
+    Return the parts and whether nothing has been dropped.
+    '''
+    atoms = []  # template parts at the current depth
+    stack = []  # parents atoms for each enclosing non capturing group
+    last = None  # the last atom kind: None, 'run' (literal characters) or 'atom'
+    depth, name, start = 0, None, 0  # capturing group depth, name and start, their content is not output
+    exact = True
+    for match in RE_TOKEN.finditer(regex):
+        kind = match.lastgroup
+        if depth:
+            if kind in ('name', 'group', 'extension'):
+                depth += 1
+            elif kind == 'close':
+                depth -= 1
+                if not depth:
+                    atoms.append((name, regex[start:match.start()]))
+                    last = 'atom'
+        elif kind == 'literal':
+            atoms.append(match.group(kind))
+            last = 'run'
+        elif kind == 'escaped':
+            char = match.group(kind)
+            if char.isalnum():  # character class, backreference or special character
+                raise _UnsupportedRegex(regex)
+            atoms.append(char)
+            last = 'atom'
+        elif kind == 'name':
+            depth, name, start = 1, match.group(kind), match.end()
+        elif kind == 'group':
+            if match.group(kind) == '(':
+                depth, name, start = 1, '', match.end()
+            else:
+                stack.append(atoms)
+                atoms, last = [], None
+        elif kind == 'close' and stack:
+            group = atoms
+            atoms = stack.pop()
+            atoms.append(group)
+            last = 'atom'
+        elif kind == 'optional' and last:
+            # Optionnal parts are removed, only the last character of a literal run is concerned
+            if last == 'run':
+                atoms[-1] = atoms[-1][:-1]
+            else:
+                atoms.pop()
+            last, exact = None, False
+        elif kind == 'anchor':
+            last = None
+        else:
+            raise _UnsupportedRegex(regex)
+    if depth or stack:
+        raise _UnsupportedRegex(regex)
+    return _flatten(atoms), exact
+
+
+def _flatten(atoms):
+    '''Flatten non capturing groups atoms'''
+    parts = []
+    for atom in atoms:
+        if isinstance(atom, list):
+            parts.extend(_flatten(atom))
+        else:
+            parts.append(atom)
+    return parts
+
+
+def _compile_template_fallback(regex):
+    '''
+    Compile a regex into a template using substitutions.
+
+    Used for the constructs the single pass compiler does not handle
+    (alternatives, character sets or mandatory repetitions outside groups).
+    '''
+    template = RE_START_END.sub('', regex)
+    # remove optionnal non capturing groups
+    for match in RE_OPT_GRP.findall(template):
+        template = template.replace(match, '')
+    # remove optionnal characters
+    for match in RE_OPT.findall(template):
+        template = template.replace(match, '')
+    # handle kwargs, args
+    for el in RE_KWARG.findall(template):
+        # prepare the output for JS resolver
+        template = template.replace(el[0], "<%s>" % el[1])
+    # after processing all kwargs try args
+    for el in RE_ARG.findall(template):
+        template = template.replace(el, "<>")  # replace by a empty parameter name
+    # Unescape charaters
+    return RE_ESCAPE.sub(r'\1', template)
+
+
+def _get_callback_name(callback):
+    '''
+    Get the dotted name of a module level function view or ``None``.
+
+    Results are cached by callback.
+    '''
+    try:
+        return _CALLBACK_NAMES[callback]
+    except KeyError:
+        pass
+    mod_name = getattr(callback, '__module__', None)
+    obj_name = getattr(callback, '__name__', None)
+    obj = getattr(sys.modules.get(mod_name), obj_name, None) if obj_name else None
+    if isinstance(obj, types.FunctionType):
+        name = '%s.%s' % (mod_name, obj_name)
+    else:
+        name = None
+        logger.debug('Unable to resolve a function name for unnamed URL callback %r', callback)
+    _CALLBACK_NAMES[callback] = name
+    return name
+
+
+def _namespace_filtered(namespace):
+    '''
+    Get the setting name of the filter preventing a namespace to be walked:
+    the namespaces filters or a names whitelist it can't contain any name of.
+
+    Return ``None`` if the namespace should be walked.
+    '''
+    filters = get_config().filters
+    included, excluded = filters['JS_URLS_NAMESPACES'], filters['JS_URLS_NAMESPACES_EXCLUDE']
+    if included and namespace not in included:
+        return 'JS_URLS_NAMESPACES'
+    if excluded and namespace in excluded:
+        return 'JS_URLS_NAMESPACES_EXCLUDE'
+    names = filters['JS_URLS']
+    if names and not names.may_contain(namespace):
+        return 'JS_URLS'
+    used, dynamic = _get_usage_filter(), filters['JS_URLS_DYNAMIC']
+    if used is not None and not used.may_contain(namespace) and not (dynamic and dynamic.may_contain(namespace)):
+        return 'JS_URLS_USAGE'
+    return None
+
+
+def _url_size(url):
+    '''
+    Get the size of an URL in the serialized JSON mapping.
+    '''
+    name, template = url
+    return len(encode_basestring_ascii(name)) + len(encode_basestring_ascii(template)) + 2
+
+
+def _get_usage_filter():
+    '''
+    Get the URLs names used from javascript (see the ``js scan`` command)
+    as a :class:`~djangojs.utils.NamesFilter`.
+
+    Return ``None`` if ``settings.JS_URLS_USAGE`` is not set or can't be read.
+    '''
+    filename = get_config().JS_URLS_USAGE
+    try:
+        return _USAGE[filename]
+    except KeyError:
+        pass
+    names_filter = None
+    if filename:
+        try:
+            with open(filename) as usage_file:
+                names_filter = NamesFilter(json.load(usage_file))
+        except (IOError, ValueError) as e:
+            logger.warning('Unable to load the URLs usage manifest %s: %s', filename, e)
+    _USAGE[filename] = names_filter
+    return names_filter
+
+
+def _get_urlconf(urlconf=None):
+    return urlconf or get_urlconf() or get_config().ROOT_URLCONF
+
+
+def _get_resolver(urlconf):
+    '''
+    Get the Django resolver of an URLconf.
+
+    A new resolver means Django ``clear_url_caches()`` has been called (ie. URLconfs have been reloaded)
+    so the compiled nodes are dropped.
+    '''
+    resolver = get_resolver(urlconf)
+    if _RESOLVERS.get(urlconf, resolver) is not resolver:
+        _clear_compiled()
+    _RESOLVERS[urlconf] = resolver
+    return resolver
+
+
+def _clear_compiled():
+    '''
+    Drop the compiled URLconfs nodes.
+    '''
+    _URLCONFS.clear()
+    _LOCALIZED.clear()
+    _APPHOOKS.clear()
+    _RESOLVERS.clear()
+
+
+def _get_language():
+    '''
+    Get the active language as listed in ``settings.LANGUAGES``,
+    falling back on its generic variant (``fr`` for ``fr-ca``) if needed.
+    '''
+    config = get_config()
+    language = translation.get_language() or config.LANGUAGE_CODE
+    for code in (language, language.split('-')[0]):
+        if code in config.language_codes:
+            return code
+    return language
+
+
+def _is_translated(pattern):
+    return isinstance(getattr(pattern, '_regex', None), Promise)
+
+
+def _is_localized(urlconf):
+    '''
+    Check if an URLconf templates depend on the active language, included URLconfs too.
+
+    django-cms apphooks are considered localized.
+    '''
+    key = _get_urlconf_key(urlconf)
+    try:
+        return _LOCALIZED[key]
+    except KeyError:
+        pass
+    localized = False
+    for kind, value, pattern in _compile_urlconf(urlconf):
+        if kind in (TRANSLATED, APPHOOK):
+            localized = True
+        elif kind == INCLUDE:
+            localized = (isinstance(pattern, LocaleRegexURLResolver) or _is_translated(pattern) or
+                         _is_localized(pattern.urlconf_name))
+        if localized:
+            break
+    _LOCALIZED[key] = localized
+    return localized
+
+
+def _get_urlconf_key(urlconf):
+    # Lists and modules are kept with their nodes so their id can't be reused
+    return urlconf if isinstance(urlconf, six.string_types) else id(urlconf)
+
+
+def _build_urls(urlconf, prefix, language):
+    '''
+    Build an URLs mapping, loading it from ``settings.JS_URLS_CACHE_DIR`` if possible.
+    '''
+    cache_dir = get_config().JS_URLS_CACHE_DIR
+    if not cache_dir:
+        return dict(_iter_urls(urlconf))
+    fingerprint = _get_fingerprint(urlconf)
+    if fingerprint is None:
+        return dict(_iter_urls(urlconf))
+    identity = json.dumps([_get_urlconf_name(urlconf), prefix, language])
+    filename = os.path.join(cache_dir, 'urls-%s.json' % hashlib.sha1(force_bytes(identity)).hexdigest())
+    try:
+        with open(filename, 'rb') as cache_file:
+            cached = json.loads(cache_file.read().decode('utf-8'))
+        if cached['fingerprint'] == fingerprint:
+            return cached['urls']
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        pass  # Missing or corrupted, rebuild it
+    urls = dict(_iter_urls(urlconf))
+    data = force_bytes(json.dumps({'fingerprint': fingerprint, 'urls': urls}, separators=(',', ':')))
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        _write_file(filename, data)
+    except (IOError, OSError) as e:
+        logger.warning('Unable to write the URLs cache file %s: %s', filename, e)
     return urls
 
 
-def _get_urls(module, prefix='', namespace=None):
-    urls = {}
-    if isinstance(module, (six.text_type, six.string_types)):
+def _write_file(filename, data):
+    '''
+    Write a file atomically: other processes never read a partial file.
+    '''
+    fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as tmp_file:
+        tmp_file.write(data)
+    getattr(os, 'replace', os.rename)(tmp_filename, filename)
+
+
+def _get_fingerprint(urlconf):
+    '''
+    Get an URLconf disk cache fingerprint from its modules files modification times,
+    its included patterns lists structure, the serialization settings and Django.js version.
+
+    Return ``None`` if the URLconf can't be cached on disk:
+    it isn't defined in files or it contains django-cms apphooks.
+    '''
+    files, structure = {}, []
+    if isinstance(urlconf, (list, tuple)) or not _collect_files(urlconf, files, set(), structure):
+        return None
+    config = get_config()
+    if config.JS_URLS_USAGE and os.path.exists(config.JS_URLS_USAGE):
+        files[config.JS_URLS_USAGE] = os.path.getmtime(config.JS_URLS_USAGE)
+    from djangojs import __version__
+    fingerprint = {
+        'version': __version__,
+        'files': sorted(files.items()),
+        'structure': structure,
+        'settings': [repr(getattr(config, name)) for name in (
+            'JS_URLS', 'JS_URLS_EXCLUDE', 'JS_URLS_NAMESPACES', 'JS_URLS_NAMESPACES_EXCLUDE', 'JS_URLS_UNNAMED',
+            'JS_URLS_USAGE', 'JS_URLS_DYNAMIC',
+        )],
+    }
+    return hashlib.sha1(force_bytes(json.dumps(fingerprint, sort_keys=True))).hexdigest()
+
+
+def _collect_files(urlconf, files, seen, structure):
+    '''
+    Collect the modification time of the files of an URLconf and its included ones.
+
+    Included patterns lists (ie. ``admin.site.urls``) may be built anywhere
+    so the files of their callbacks modules are collected
+    and their regexes, names and namespaces are appended to ``structure``.
+
+    Return ``False`` if the URLconf can't be fingerprinted.
+    '''
+    listed = isinstance(urlconf, (list, tuple))
+    if listed:
+        patterns = urlconf
+    else:
+        if isinstance(urlconf, six.string_types):
+            try:
+                __import__(urlconf)
+            except ImportError:
+                return False
+            urlconf = sys.modules[urlconf]
+        if urlconf.__name__ in seen:
+            return True
+        seen.add(urlconf.__name__)
+        if not _collect_module_file(urlconf, files):
+            return False
+        patterns = getattr(urlconf, 'urlpatterns', ())
+    for pattern in patterns:
+        if CMS_APP_RESOLVER and isinstance(pattern, AppRegexURLResolver):
+            return False
+        if isinstance(pattern, RegexURLResolver):
+            if listed:
+                structure.append([_get_regex_source(pattern), pattern.namespace, pattern.app_name])
+            if pattern.urlconf_name and not _collect_files(pattern.urlconf_name, files, seen, structure):
+                return False
+        elif listed:
+            structure.append([_get_regex_source(pattern), pattern.name])
+            callback = getattr(pattern, '_callback_str', None)  # Don't import string callbacks
+            module = callback.rsplit('.', 1)[0] if callback else getattr(pattern.callback, '__module__', None)
+            if module and not _collect_module_file(module, files):
+                return False
+    return True
+
+
+def _collect_module_file(module, files):
+    '''
+    Collect the modification time of a module (or module name) file.
+
+    Return ``False`` if the module isn't defined in a file.
+    '''
+    if isinstance(module, six.string_types):
         try:
             __import__(module)
-            root_urls = sys.modules[module]
-            patterns = root_urls.urlpatterns
+        except ImportError:
+            return False
+        module = sys.modules[module]
+    filename = getattr(module, '__file__', None)
+    if not filename:
+        return False
+    if filename.endswith(('.pyc', '.pyo')) and os.path.exists(filename[:-1]):
+        filename = filename[:-1]
+    try:
+        files[filename] = os.path.getmtime(filename)
+    except OSError:
+        return False
+    return True
+
+
+def _get_regex_source(pattern):
+    return force_text(getattr(pattern, '_regex', None) or pattern.regex.pattern)
+
+
+def _get_urlconf_name(urlconf):
+    if isinstance(urlconf, six.string_types):
+        return urlconf
+    return getattr(urlconf, '__name__', None)
+
+
+def _iter_urls(urlconf):
+    return _expand(_compile_urlconf(urlconf), get_script_prefix(), None)
+
+
+def _expand(nodes, prefix, namespace, compile=_compile_template, stats=None):
+    '''
+    Expand compiled URLconf nodes with a given prefix and namespace,
+    applying the names and namespaces filters.
+
+    Regexes are compiled with ``compile`` whose results are concatenated to ``prefix``.
+    Filters hits and includes are recorded into ``stats`` if given (see :func:`urls_stats`).
+    '''
+    filters = get_config().filters
+    included, excluded, dynamic = filters['JS_URLS'], filters['JS_URLS_EXCLUDE'], filters['JS_URLS_DYNAMIC']
+    used = _get_usage_filter()
+    for kind, value, pattern in nodes:
+        if kind in (URL, TRANSLATED):
+            name = ':'.join((namespace, value)) if namespace else value
+            if included and value not in included and name not in included:
+                if stats is not None:
+                    stats['filters']['JS_URLS'] += 1
+                continue
+            if excluded and (value in excluded or name in excluded):
+                if stats is not None:
+                    stats['filters']['JS_URLS_EXCLUDE'] += 1
+                continue
+            if used is not None and name not in used and name not in dynamic:
+                if stats is not None:
+                    stats['filters']['JS_URLS_USAGE'] += 1
+                continue
+            # Translated regexes are compiled for the active language
+            yield name, prefix + compile(pattern if kind == URL else pattern.regex.pattern)
+        elif kind == APPHOOK:
+            for url in _expand(_compile_apphook(pattern), prefix, namespace, compile, stats):
+                yield url
+        elif kind == INCLUDE:
+            new_prefix = prefix + compile(pattern.regex.pattern)
+            for ns in value:
+                namespaces = ':'.join(nsp for nsp in (namespace, ns) if nsp)
+                if namespaces and ns:
+                    rejected_by = _namespace_filtered(namespaces)
+                    if rejected_by:
+                        if stats is not None:
+                            stats['filters'][rejected_by] += 1
+                        continue
+                if stats is None:
+                    for url in _expand(_compile_urlconf(pattern.urlconf_name), new_prefix, namespaces, compile):
+                        yield url
+                    continue
+                include = {
+                    'urlconf': _get_urlconf_name(pattern.urlconf_name),
+                    'namespace': namespaces,
+                    'prefix': new_prefix,
+                    'patterns': 0,
+                    'bytes': 0,
+                }
+                stats['includes'].append(include)
+                start = _timer()
+                for url in _expand(_compile_urlconf(pattern.urlconf_name), new_prefix, namespaces, compile, stats):
+                    include['patterns'] += 1
+                    include['bytes'] += _url_size(url)
+                    yield url
+                include['time'] = _timer() - start
+
+
+def _build_plans(urlconf, prefix, language):
+    '''
+    Build the reverse plans of an URLconf for a script prefix and a language.
+    '''
+    if language:
+        with translation.override(language):
+            return _build_plans(urlconf, prefix, None)
+    plans = {}
+    for name, parts in _expand(_compile_urlconf(urlconf), (urlquote(prefix),), None, _compile_plan):
+        # Names reversed by many patterns depend on arguments, let reverse() handle them
+        plans[name] = ReversePlan(parts) if name not in plans and None not in parts else None
+    return plans
+
+
+def _compile_apphook(resolver):
+    '''
+    Compile a django-cms apphook resolver patterns.
+
+    Resolving them is costly so they are cached until django-cms reloads its URLs
+    (new resolvers are created) or a page is published.
+    '''
+    key = id(resolver)
+    try:
+        return _APPHOOKS[key][1]
+    except KeyError:
+        pass
+    nodes = _compile_patterns(resolver.url_patterns)
+    _APPHOOKS[key] = (resolver, nodes)  # Keep the resolver so its id can't be reused
+    return nodes
+
+
+def _compile_urlconf(urlconf):
+    '''
+    Compile an URLconf into prefix and namespace independent nodes.
+
+    Results are cached by URLconf so an URLconf included many times,
+    or under many namespaces, is only compiled once.
+    '''
+    key = _get_urlconf_key(urlconf)
+    try:
+        return _URLCONFS[key][1]
+    except KeyError:
+        pass
+    if isinstance(urlconf, six.string_types):
+        try:
+            __import__(urlconf)
+            patterns = sys.modules[urlconf].urlpatterns
         except ImportError:  # die silently
             patterns = tuple()
-    elif isinstance(module, (list, tuple)):
-        patterns = module
-    elif isinstance(module, types.ModuleType):
-        patterns = module.urlpatterns
+    elif isinstance(urlconf, (list, tuple)):
+        patterns = urlconf
+    elif isinstance(urlconf, types.ModuleType):
+        patterns = urlconf.urlpatterns
     else:
-        raise TypeError('Unsupported type: %s' % type(module))
+        raise TypeError('Unsupported type: %s' % type(urlconf))
+    nodes = _compile_patterns(patterns)
+    _URLCONFS[key] = (urlconf, nodes)
+    return nodes
 
-    for pattern in patterns:
-        urls.update(_get_urls_for_pattern(pattern, prefix=prefix, namespace=namespace))
 
-    return urls
+def _compile_patterns(patterns):
+    '''
+    Compile URL patterns into ``(kind, value, pattern)`` nodes where:
+
+    - ``URL`` nodes value is the URL name and pattern its regex.
+    - ``TRANSLATED`` nodes value is the URL name and pattern the URL pattern
+      whose template depends on the active language.
+    - ``INCLUDE`` nodes value is the namespaces to include the resolver pattern into.
+    - ``APPHOOK`` nodes are django-cms resolvers whose patterns are compiled on expansion.
+    '''
+    nodes = []
+    unnamed = get_config().JS_URLS_UNNAMED
+    for pattern in patterns:
+        if isinstance(pattern, RegexURLPattern):
+            if unnamed:
+                name = pattern.name or _get_callback_name(pattern.callback)
+            else:
+                name = pattern.name
+            if name and _is_translated(pattern):
+                nodes.append((TRANSLATED, name, pattern))
+            elif name:
+                nodes.append((URL, name, pattern.regex.pattern))
+        elif CMS_APP_RESOLVER and isinstance(pattern, AppRegexURLResolver):  # hack for django-cms
+            nodes.append((APPHOOK, None, pattern))
+        elif isinstance(pattern, RegexURLResolver) and pattern.urlconf_name:
+            if pattern.namespace and not pattern.app_name:
+                # Namespace without app_name
+                namespaces = (pattern.namespace,)
+            else:
+                # Add urls twice: for app and instance namespace
+                namespaces = tuple(set((pattern.namespace, pattern.app_name)))
+            nodes.append((INCLUDE, namespaces, pattern))
+    return tuple(nodes)
@@ -4,10 +4,14 @@ This modules holds every helpers that does not fit in any standard django module
 '''
 from __future__ import unicode_literals
 
+import fnmatch
 import logging
 import os
+import re
 import sys
 
+from itertools import chain
+
 from django.contrib.staticfiles import finders
 from django.contrib.staticfiles.utils import matches_patterns
 from django.core.serializers.json import DjangoJSONEncoder
@@ -16,10 +20,14 @@ from django.utils.functional import Promise
 
 logger = logging.getLogger(__name__)
 
+RE_GLOB = re.compile(r'[*?[]')  # Recognize glob-style patterns special characters
+
 
 __all__ = (
     'class_from_string',
+    'ImmutableDict',
     'LazyJsonEncoder',
+    'NamesFilter',
     'StorageGlobber',
 )
 
@@ -34,6 +42,19 @@ def class_from_string(name):
     return getattr(module, class_name)
 
 
+class ImmutableDict(dict):
+    '''
+    A dictionnary raising an error on any mutation attempt.
+
+    Used to safely share cached mappings between callers.
+    '''
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('%s object is immutable' % self.__class__.__name__)
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+
 class LazyJsonEncoder(DjangoJSONEncoder):
     '''
     A JSON encoder handling promises (aka. Django lazy objects).
@@ -46,6 +67,51 @@ class LazyJsonEncoder(DjangoJSONEncoder):
         return super(LazyJsonEncoder, self).default(obj)
 
 
+class NamesFilter(object):
+    '''
+    A compiled names list supporting glob-style patterns (ie. ``api:*``).
+
+    Exact names are looked up in a frozenset
+    and patterns are combined into a single regular expression.
+    '''
+    def __init__(self, names=None):
+        names = names or ()
+        patterns = [name for name in names if RE_GLOB.search(name)]
+        #: Exact names
+        self.names = frozenset(names).difference(patterns)
+        #: Combined glob patterns regex
+        self.regex = re.compile('|'.join('(?:%s)' % fnmatch.translate(p) for p in patterns)) if patterns else None
+        # Namespaces which may contain matching names, only known if every entry is qualified
+        prefixes = [RE_GLOB.split(pattern, maxsplit=1)[0] for pattern in patterns]
+        if names and all(':' in name for name in chain(self.names, prefixes)):
+            self.namespaces = set()
+            for name in self.names:
+                parts = name.split(':')[:-1]
+                self.namespaces.update(':'.join(parts[:idx + 1]) for idx in range(len(parts)))
+            self.patterns_prefixes = tuple(prefixes)
+        else:
+            self.namespaces = self.patterns_prefixes = None
+
+    def __bool__(self):
+        return bool(self.names) or self.regex is not None
+
+    __nonzero__ = __bool__  # Python 2
+
+    def __contains__(self, name):
+        return name in self.names or (self.regex is not None and self.regex.match(name) is not None)
+
+    def may_contain(self, namespace):
+        '''
+        Wether names from a given namespace may match.
+
+        Always ``True`` when some names or patterns are not qualified by a namespace.
+        '''
+        if self.namespaces is None or namespace in self.namespaces:
+            return True
+        namespace = '%s:' % namespace
+        return any(namespace.startswith(p) or p.startswith(namespace) for p in self.patterns_prefixes)
+
+
 class StorageGlobber(object):
     '''
     Retrieve file list from static file storages.
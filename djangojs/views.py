@@ -8,14 +8,20 @@ import json
 import logging
 import re
 
-from django.http import HttpResponse
-from django.utils.cache import patch_vary_headers
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse, HttpResponseForbidden, Http404
+try:
+    from django.http import StreamingHttpResponse
+except ImportError:  # Django < 1.5
+    StreamingHttpResponse = None
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.views.decorators.cache import cache_page
 from django.views.generic import View, TemplateView
 
-from djangojs.conf import settings
-from djangojs.urls_serializer import urls_as_dict, urls_as_json
-from djangojs.utils import StorageGlobber, LazyJsonEncoder, class_from_string
+from djangojs.conf import get_config
+from djangojs.context_serializer import get_permissions_table
+from djangojs.urls_serializer import urls_as_dict, get_urls_entry, urls_stats
+from djangojs.utils import StorageGlobber, LazyJsonEncoder
 
 
 logger = logging.getLogger(__name__)
@@ -25,7 +31,9 @@ __all__ = (
     'JsInitView',
     'JsonView',
     'UrlsJsonView',
+    'UrlsStatsView',
     'ContextJsonView',
+    'PermissionsJsonView',
     'JsTestView',
     'JasmineView',
     'QUnitView',
@@ -36,15 +44,22 @@ RE_ARG = re.compile(r"(\(.*?\))")  # Pattern for recognizing unnamed url paramet
 RE_OPT = re.compile(r"\w\?")  # Pattern for recognizing optionnal character
 RE_OPT_GRP = re.compile(r"\(\?\:.*\)\?")  # Pattern for recognizing optionnal group
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
 JSON_MIMETYPE = 'application/json'
 JAVASCRIPT_MIMETYPE = 'application/javascript'
 
 
 class CacheMixin(object):
-    '''Apply a JS_CACHE_DURATION to the view'''
-    def dispatch(self, *args, **kwargs):
-        cache = cache_page(60 * settings.JS_CACHE_DURATION)
-        return cache(super(CacheMixin, self).dispatch)(*args, **kwargs)
+    '''Apply a JS_CACHE_DURATION to the view, cached by request URLconf (``request.urlconf``)'''
+    def dispatch(self, request, *args, **kwargs):
+        config = get_config()
+        key_prefix = config.CACHE_MIDDLEWARE_KEY_PREFIX
+        urlconf = getattr(request, 'urlconf', None)
+        if urlconf:
+            key_prefix = '%s.%s' % (key_prefix, getattr(urlconf, '__name__', urlconf))
+        cache = cache_page(60 * config.JS_CACHE_DURATION, key_prefix=key_prefix)
+        return cache(super(CacheMixin, self).dispatch)(request, *args, **kwargs)
 
 
 class UserCacheMixin(CacheMixin):
@@ -62,9 +77,23 @@ class JsInitView(UserCacheMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(JsInitView, self).get_context_data(**kwargs)
-        context['urls'] = urls_as_json()
-        serializer = class_from_string(settings.JS_CONTEXT_PROCESSOR)
-        context['context'] = serializer(self.request).as_json()
+        config = get_config()
+        entry = get_urls_entry(getattr(self.request, 'urlconf', None))
+        served = entry.compact if config.JS_URLS_COMPACT else entry
+        if config.JS_URLS_SHARDED:
+            preload = config.preload
+            context['urls'] = entry.shards_payload(sorted(preload)).decode('ascii')
+            context['shards'] = json.dumps(dict(
+                (namespace, '%s?v=%s' % (
+                    reverse('django_js_urls_shard', kwargs={'namespace': namespace}),
+                    shard.hash[:12]
+                ))
+                for namespace, shard in served.shards.items()
+                if namespace not in preload
+            ), sort_keys=True)
+        else:
+            context['urls'] = served.payload.decode('ascii')
+        context['context'] = config.context_processor(self.request).as_json()
         return context
 
     def render_to_response(self, context, **response_kwargs):
@@ -87,18 +116,89 @@ class JsonView(View):
 class UrlsJsonView(CacheMixin, JsonView):
     '''
     Render the URLs as a JSON object.
+
+    The cached serialized URLs are sent as is, with their hash as ``ETag``.
+    Only the URLs of the top-level ``namespace`` are sent if given.
+    A payload shared by :func:`~djangojs.urls_serializer.preload_urls`
+    is streamed from its memory-mapped file without being copied.
+    '''
+    def get(self, request, namespace=None, **kwargs):
+        entry = get_urls_entry(getattr(request, 'urlconf', None))
+        if get_config().JS_URLS_COMPACT:
+            entry = entry.compact
+        if namespace:
+            if namespace not in entry.shards:
+                raise Http404('Unknown namespace "%s"' % namespace)
+            entry = entry.shards[namespace]
+        if entry.shared is not None and StreamingHttpResponse:
+            response = StreamingHttpResponse(self.stream(entry.shared), content_type=JSON_MIMETYPE)
+            response['Content-Length'] = len(entry.shared)
+        else:
+            response = HttpResponse(entry.payload, content_type=JSON_MIMETYPE)
+        response['ETag'] = '"%s"' % entry.hash
+        return response
+
+    def stream(self, shared):
+        for offset in range(0, len(shared), STREAM_CHUNK_SIZE):
+            yield shared[offset:offset + STREAM_CHUNK_SIZE]
+
+    def get_context_data(self, **kwargs):
+        return urls_as_dict(getattr(self.request, 'urlconf', None))
+
+
+class UrlsStatsView(JsonView):
+    '''
+    Render the URLs mapping diagnostics as a JSON object (only in ``DEBUG`` mode).
+
+    See :func:`~djangojs.urls_serializer.urls_stats`.
     '''
+    def dispatch(self, request, *args, **kwargs):
+        if not get_config().DEBUG:
+            raise Http404('URLs diagnostics are only available in DEBUG mode')
+        return super(UrlsStatsView, self).dispatch(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
-        return urls_as_dict()
+        return urls_stats(getattr(self.request, 'urlconf', None))
 
 
 class ContextJsonView(UserCacheMixin, JsonView):
     '''
     Render the context as a JSON object.
     '''
+    def get(self, request, **kwargs):
+        return HttpResponse(get_config().context_processor(request).as_json(), content_type=JSON_MIMETYPE)
+
     def get_context_data(self, **kwargs):
-        serializer = class_from_string(settings.JS_CONTEXT_PROCESSOR)
-        return serializer(self.request).as_dict()
+        return get_config().context_processor(self.request).as_dict()
+
+
+class PermissionsJsonView(CacheMixin, View):
+    '''
+    Render the permissions table as a JSON array (only with ``settings.JS_USER_PERMISSIONS_COMPACT``).
+
+    The table doesn't depend on the user so it is cached once, with its hash as ``ETag``,
+    but it is only sent to authenticated users.
+    A table whose hash doesn't match the requested version (``v``) is rebuilt
+    and a 404 is returned if it still doesn't match.
+    '''
+    def dispatch(self, request, *args, **kwargs):
+        if not get_config().JS_USER_PERMISSIONS_COMPACT:
+            raise Http404('Permissions are not encoded')
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated():
+            return HttpResponseForbidden()
+        version = request.GET.get('v')
+        if version and not get_permissions_table(version).hash.startswith(version):
+            raise Http404('Unknown permissions table version "%s"' % version)
+        response = super(PermissionsJsonView, self).dispatch(request, *args, **kwargs)
+        patch_cache_control(response, private=True)
+        return response
+
+    def get(self, request, **kwargs):
+        table = get_permissions_table()
+        response = HttpResponse(table.payload, content_type=JSON_MIMETYPE)
+        response['ETag'] = '"%s"' % table.hash
+        return response
 
 
 class JsTestView(TemplateView):
@@ -23,6 +23,18 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djangojs.settings")
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
 
+
+def preload():
+    '''
+    Build the URLs mappings before workers are forked (e.g. with gunicorn --preload)
+    so they all serve the same memory-mapped payload (only if settings.JS_URLS_CACHE_DIR is set).
+    '''
+    from djangojs.urls_serializer import preload_urls
+    preload_urls()
+
+
+preload()
+
 # Apply WSGI middleware here.
 # from helloworld.wsgi import HelloWorldApplication
 # application = HelloWorldApplication(application)